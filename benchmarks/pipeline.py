@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Runs without a display; must be set before Qt is imported
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+import numpy as np
+from PIL import Image
+from PyQt6 import QtCore
+from PyQt6.QtCore import QEvent, QPointF, QRect, Qt
+from PyQt6.QtGui import QMouseEvent
+from PyQt6.QtWidgets import QApplication, QFileDialog
+
+import wallpaper_cropper
+from batch import parse_monitors
+from regression import compare
+
+# Benchmark windows keep their state apart from the real settings
+wallpaper_cropper.SETTINGS_SCOPE = ('wallcrop', 'wallcrop-benchmark')
+
+# Source sizes, from a single 1080p screen up to a 16K panorama
+SIZES = {
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+    '8k': (7680, 4320),
+    '16k-pano': (15360, 4320),
+}
+
+# Modes and the file format each one is stored in
+MODES = {
+    'RGB': 'jpg',
+    'RGBA': 'png',
+    'P': 'png',
+    'L': 'png',
+    'CMYK': 'jpg',
+}
+
+# Window size every case runs at, so frame costs are comparable
+WINDOW_SIZE = (1200, 800)
+
+# Drag script: steps moving the crop, then steps resizing it from a corner
+MOVE_STEPS = 80
+RESIZE_STEPS = 40
+
+def synthetic_image(size, mode, seed=0):
+    """Deterministic photo-like image: smooth color fields, rings and fine noise"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+
+    # Smooth structure at 1/8 scale, scaled up
+    small_width, small_height = max(1, width // 8), max(1, height // 8)
+    y, x = np.mgrid[0:small_height, 0:small_width].astype(np.float32)
+    rings = np.sin(np.hypot(x - small_width * 0.6, y - small_height * 0.4) / 6.0)
+    channels = [
+        x / small_width * 255,
+        y / small_height * 255,
+        (rings + 1) * 127.5,
+    ]
+    base = np.stack(channels, axis=2) * 0.85 + rng.uniform(0, 38, (small_height, small_width, 3))
+    image = Image.fromarray(base.clip(0, 255).astype(np.uint8), 'RGB')
+    image = image.resize(size, Image.Resampling.BICUBIC)
+
+    # Fine sensor-like noise, made in bands to bound memory; never repeats,
+    # so encoders see no artificial long-distance matches
+    noise = Image.new('RGB', size)
+    for top in range(0, height, 256):
+        rows = min(256, height - top)
+        band = rng.integers(0, 256, (rows, width, 3), dtype=np.uint8)
+        noise.paste(Image.fromarray(band, 'RGB'), (0, top))
+    image = Image.blend(image, noise, 0.12)
+
+    if mode == 'RGBA':
+        alpha = Image.linear_gradient('L').resize(size, Image.Resampling.BILINEAR)
+        image.putalpha(alpha)
+    elif mode == 'P':
+        image = image.convert('P', palette=Image.Palette.WEB)
+    elif mode != 'RGB':
+        image = image.convert(mode)
+    return image
+
+def case_path(image_dir, size_name, mode):
+    return os.path.join(image_dir, f"{size_name}_{mode}.{MODES[mode]}")
+
+def ensure_image(image_dir, size_name, mode, report=print):
+    """Generate a case's source file once; later runs reuse it"""
+    path = case_path(image_dir, size_name, mode)
+    if not os.path.exists(path):
+        report(f"Generating {os.path.basename(path)}")
+        image = synthetic_image(SIZES[size_name], mode)
+        params = {'quality': 90} if MODES[mode] == 'jpg' else {'compress_level': 1}
+        image.save(path, **params)
+    return path
+
+class BenchmarkWindow(wallpaper_cropper.WallpaperCropper):
+    """The real window with a fixed monitor layout instead of the screens Qt reports"""
+    layout = None
+
+    def get_monitor_info(self):
+        self.layout_model = self.layout
+        self.monitor_info = []
+        monitors = []
+        for x, y, width, height in self.layout.monitors:
+            geometry = QRect(x, y, width, height)
+            monitors.append(geometry)
+            self.monitor_info.append({
+                'geometry': geometry,
+                'resolution': f"{width}x{height}",
+                'ratio': f"{width}/{height}"
+            })
+        return monitors
+
+    def report_saved(self, paths):
+        self.saved = paths
+
+def mouse_event(event_type, pos, button=Qt.MouseButton.LeftButton):
+    point = QPointF(pos)
+    return QMouseEvent(event_type, point, point, button, button, Qt.KeyboardModifier.NoModifier)
+
+def wait_for(app, condition, timeout=600.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Benchmark step timed out")
+        app.processEvents(QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 5)
+
+def drag(app, window, start, offsets):
+    """Press at start, move through offsets rendering each frame
+
+    Returns (event_times, frame_times) in ms: the mouse move handler
+    alone, and the handler plus the frame it causes.
+    """
+    window.mouse_press_event(mouse_event(QEvent.Type.MouseButtonPress, start))
+    event_times = []
+    frame_times = []
+    for dx, dy in offsets:
+        pos = start + QtCore.QPoint(dx, dy)
+        begin = time.perf_counter()
+        window.mouse_move_event(mouse_event(QEvent.Type.MouseMove, pos))
+        handled = time.perf_counter()
+        window.frame_scheduler.flush()
+        window.canvas.repaint()
+        event_times.append((handled - begin) * 1000)
+        frame_times.append((time.perf_counter() - begin) * 1000)
+    window.mouse_release_event(mouse_event(QEvent.Type.MouseButtonRelease, start))
+    app.processEvents()
+    return event_times, frame_times
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_case(app, path, output_dir):
+    """Load, drag and export one image in a fresh window; returns timings in ms"""
+    window = BenchmarkWindow()
+    window.resize(*WINDOW_SIZE)
+    window.show()
+    app.processEvents()
+    try:
+        # Load: until the image layer of the first frame is on the canvas
+        start = time.perf_counter()
+        window.open_image(path)
+        wait_for(app, lambda: window.current_image is not None and window.crop_rect is not None)
+        window.frame_scheduler.flush()
+        window.canvas.repaint()
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Drag: a back-and-forth move, then a resize from the bottom right handle
+        center = window.crop_rect.center()
+        moves = [((step % 40) * 3 - 60, (step % 20) - 10) for step in range(MOVE_STEPS)]
+        event_times, move_times = drag(app, window, center, moves)
+        corner = window.crop_rect.bottomRight()
+        resizes = [(-(step % 20) * 4, 0) for step in range(RESIZE_STEPS)]
+        resize_events, resize_times = drag(app, window, corner, resizes)
+
+        # Export from the decoded image, so the timing is the save itself
+        if window.current_image.is_reduced and not window.current_image.streamable:
+            window.current_image.full()
+        extension = '.png' if path.endswith('.png') else '.jpg'
+        output = os.path.join(output_dir, f"out{extension}")
+        QFileDialog.getSaveFileName = staticmethod(lambda *args, **kwargs: (output, ''))
+        window.saved = None
+        start = time.perf_counter()
+        window.split_and_save()
+        wait_for(app, lambda: window.saved is not None)
+        export_ms = (time.perf_counter() - start) * 1000
+    finally:
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+
+    return {
+        'load_ms': load_ms,
+        'event_p50_ms': statistics.median(event_times + resize_events),
+        'event_max_ms': max(event_times + resize_events),
+        'move_p50_ms': statistics.median(move_times),
+        'move_p95_ms': percentile(move_times, 0.95),
+        'resize_p50_ms': statistics.median(resize_times),
+        'resize_p95_ms': percentile(resize_times, 0.95),
+        'export_ms': export_ms,
+    }
+
+def run_suite(size_names, modes, layout, image_dir, repeat=1, report=print):
+    """Run every case, keeping the fastest of repeat runs per metric"""
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    BenchmarkWindow.layout = layout
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='wallcrop-bench-out-') as output_dir:
+        for size_name in size_names:
+            for mode in modes:
+                path = ensure_image(image_dir, size_name, mode, report)
+                runs = [run_case(app, path, output_dir) for _ in range(repeat)]
+                case = {metric: min(run[metric] for run in runs) for metric in runs[0]}
+                name = f"{size_name}/{mode}"
+                results[name] = case
+                report(f"{name:16} load {case['load_ms']:8.1f}  event p50 {case['event_p50_ms']:5.2f} "
+                       f"max {case['event_max_ms']:6.2f}  move p50 {case['move_p50_ms']:6.2f} "
+                       f"p95 {case['move_p95_ms']:6.2f}  resize p50 {case['resize_p50_ms']:6.2f}  "
+                       f"export {case['export_ms']:8.1f} ms")
+    return results
+
+def environment():
+    import PIL
+    return {
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'qt': QtCore.QT_VERSION_STR,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='benchmarks/pipeline.py',
+        description='Time load, drag frames and export of synthetic images in the real window, offscreen'
+    )
+    parser.add_argument('-s', '--sizes', default=','.join(SIZES),
+                        help=f"comma separated sizes out of {', '.join(SIZES)}")
+    parser.add_argument('-M', '--modes', default=','.join(MODES),
+                        help=f"comma separated image modes out of {', '.join(MODES)}")
+    parser.add_argument('-m', '--monitors', type=parse_monitors, default=parse_monitors('1920x1080,1920x1080'),
+                        help='monitor layout, left to right (default: 1920x1080,1920x1080)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs per case, the fastest is kept')
+    parser.add_argument('--images', default=os.path.join(tempfile.gettempdir(), 'wallcrop-bench'),
+                        help='where generated source images are kept between runs')
+    parser.add_argument('-o', '--output', help='write the results as JSON, e.g. a new baseline')
+    parser.add_argument('-c', '--compare', help='baseline JSON to compare against; exits 1 on regressions')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help='allowed slowdown before a metric counts as a regression (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    size_names = [name for name in args.sizes.split(',') if name]
+    modes = [mode for mode in args.modes.split(',') if mode]
+    for name in size_names:
+        if name not in SIZES:
+            parser.error(f"unknown size: {name}")
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode: {mode}")
+    os.makedirs(args.images, exist_ok=True)
+
+    results = run_suite(size_names, modes, args.monitors, args.images, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != environment():
+            print("Warning: the baseline was recorded in a different environment")
+        regressions = compare(baseline['results'], results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.threshold * 100:.0f}%")
+            return 1
+        print("No regressions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,22 @@
+# Shared by the benchmarks; imports nothing heavy, so the startup
+# benchmark can use it without loading what it measures
+
+# Regressions smaller than this are noise, whatever the ratio
+MIN_DELTA_MS = 3.0
+
+def compare(baseline, results, threshold, report=print):
+    """Report metrics slower than the baseline by more than threshold; returns the regressions"""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, value in metrics.items():
+            old = base.get(metric)
+            if old is None:
+                continue
+            if value > old * (1 + threshold) and value - old > MIN_DELTA_MS:
+                regressions.append((name, metric, old, value))
+                report(f"REGRESSION {name} {metric}: {old:.2f} -> {value:.2f} ms "
+                       f"(+{(value / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+def child():
+    """Start the window in this process and report when its first frame is painted
+
+    Times are time.monotonic() values, which every process shares, so
+    the parent can measure from before it spawned this interpreter.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, SRC)
+
+    import wallpaper_cropper
+    from PyQt6.QtCore import QEvent, QObject
+    # Benchmark windows keep their state apart from the real settings
+    wallpaper_cropper.SETTINGS_SCOPE = ('wallcrop', 'wallcrop-benchmark')
+    from PyQt6.QtWidgets import QApplication
+    imported = time.monotonic()
+
+    times = {}
+
+    class FirstPaint(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Type.Paint and 'first_frame' not in times:
+                times['first_frame'] = time.monotonic()
+            return False
+
+    app = QApplication(sys.argv[:1])
+    window = wallpaper_cropper.WallpaperCropper()
+    constructed = time.monotonic()
+    watcher = FirstPaint()
+    window.canvas.installEventFilter(watcher)
+    window.show()
+    while 'first_frame' not in times:
+        app.processEvents()
+    modules = sorted(name for name in ('PIL', 'numpy', 'sqlite3', 'multiprocessing') if name in sys.modules)
+    print(json.dumps({
+        'imported': imported,
+        'constructed': constructed,
+        'first_frame': times['first_frame'],
+        'modules': modules,
+    }))
+    window.close()
+
+def measure(repeat, report=print):
+    """Median milliseconds from spawning the interpreter to each startup milestone"""
+    samples = {'import_ms': [], 'window_ms': [], 'first_frame_ms': []}
+    modules = []
+    for _ in range(repeat):
+        start = time.monotonic()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child'],
+            check=True, capture_output=True, text=True
+        ).stdout
+        marks = json.loads(output.strip().splitlines()[-1])
+        samples['import_ms'].append((marks['imported'] - start) * 1000)
+        samples['window_ms'].append((marks['constructed'] - start) * 1000)
+        samples['first_frame_ms'].append((marks['first_frame'] - start) * 1000)
+        modules = marks['modules']
+
+    result = {name: statistics.median(values) for name, values in samples.items()}
+    report(f"imports done {result['import_ms']:7.1f} ms  window built {result['window_ms']:7.1f} ms  "
+           f"first frame {result['first_frame_ms']:7.1f} ms  (median of {repeat})")
+    report(f"heavy modules loaded before the first frame: {', '.join(modules) or 'none'}")
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='benchmarks/startup.py',
+        description='Time from launching the app to its first painted frame, offscreen'
+    )
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='launches to take the median of')
+    parser.add_argument('-o', '--output', help='write the results as JSON, e.g. a new baseline')
+    parser.add_argument('-c', '--compare', help='baseline JSON to compare against; exits 1 on regressions')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help='allowed slowdown before a metric counts as a regression (default: 0.25)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child()
+        return 0
+
+    results = {'startup': measure(args.repeat)}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        from regression import compare
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline['results'], results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.threshold * 100:.0f}%")
+            return 1
+        print("No regressions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
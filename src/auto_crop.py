@@ -0,0 +1,130 @@
+import numpy as np
+from PIL import Image
+
+from crop_plan import plan_crops
+from image_pyramid import fit_size, reducible
+
+# Longest side of the copy the crop is scored on
+SCORE_SIZE = 256
+
+# Width of the band around a monitor split line, as a share of the crop
+SPLIT_BAND = 0.04
+
+# Weight of energy on a split line against energy inside the crop
+SPLIT_PENALTY = 0.5
+
+# Small pull towards the center so flat images keep a centered crop
+CENTER_BIAS = 0.01
+
+def open_for_analysis(path):
+    """Open path for analysis_image(); JPEGs decode at down to 1/8 scale"""
+    image = Image.open(path)
+    image.draft('L', (SCORE_SIZE, SCORE_SIZE))
+    return image
+
+def analysis_image(image):
+    """Get a small grayscale copy of image to score crops on"""
+    size = fit_size(image.size, (SCORE_SIZE, SCORE_SIZE))
+    if image.width <= size[0]:
+        return reducible(image).convert('L')
+    small = reducible(image).resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return small.convert('L')
+
+def energy_map(small):
+    """Edge energy plus contrast against the image mean, normalized to mean 1"""
+    luma = np.asarray(small, dtype=np.float32)
+    energy = np.zeros_like(luma)
+    energy[:, 1:] += np.abs(np.diff(luma, axis=1))
+    energy[1:, :] += np.abs(np.diff(luma, axis=0))
+    energy += 0.25 * np.abs(luma - luma.mean())
+    mean = energy.mean()
+    return energy / mean if mean > 0 else energy
+
+def integral_image(values):
+    """Summed-area table with a zero first row and column"""
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    table[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    return table
+
+def box_sums(table, x1, y1, x2, y2):
+    """Sum of the values inside each box, O(1) per box; arguments broadcast"""
+    return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+def split_lines(fractions):
+    """Monitor edges that fall inside the crop, as x and y fractions"""
+    xs = sorted({f for monitor in fractions for f in (monitor[0], monitor[2]) if 0 < f < 1})
+    ys = sorted({f for monitor in fractions for f in (monitor[1], monitor[3]) if 0 < f < 1})
+    return xs, ys
+
+def score_positions(energy, crop_size, fractions):
+    """Score every crop position on the energy map
+
+    Returns (scores, xs, ys) with scores[i, j] for the crop at (xs[j], ys[i]).
+    A crop scores its mean energy, minus SPLIT_PENALTY times the mean
+    energy of the band around every split line, minus a small center bias.
+    """
+    height, width = energy.shape
+    crop_width, crop_height = crop_size
+    table = integral_image(energy)
+
+    xs = np.arange(width - crop_width + 1)
+    ys = np.arange(height - crop_height + 1)
+    x1 = xs[None, :]
+    y1 = ys[:, None]
+    area = crop_width * crop_height
+    scores = box_sums(table, x1, y1, x1 + crop_width, y1 + crop_height) / area
+
+    band_x = max(1, round(crop_width * SPLIT_BAND / 2))
+    band_y = max(1, round(crop_height * SPLIT_BAND / 2))
+    split_xs, split_ys = split_lines(fractions)
+    for fraction in split_xs:
+        line = x1 + round(fraction * crop_width)
+        left = np.clip(line - band_x, 0, width)
+        right = np.clip(line + band_x, 0, width)
+        band = box_sums(table, left, y1, right, y1 + crop_height)
+        scores = scores - SPLIT_PENALTY * band / ((right - left) * crop_height)
+    for fraction in split_ys:
+        line = y1 + round(fraction * crop_height)
+        top = np.clip(line - band_y, 0, height)
+        bottom = np.clip(line + band_y, 0, height)
+        band = box_sums(table, x1, top, x1 + crop_width, bottom)
+        scores = scores - SPLIT_PENALTY * band / ((bottom - top) * crop_width)
+
+    # Distance from the centered position, 0 to 1 along each axis
+    center_x = (width - crop_width) / 2
+    center_y = (height - crop_height) / 2
+    offset = (
+        np.abs(x1 - center_x) / max(center_x, 1)
+        + np.abs(y1 - center_y) / max(center_y, 1)
+    )
+    return scores - CENTER_BIAS * offset, xs, ys
+
+def auto_crop_box(image, layout, fill=1.0, image_size=None):
+    """Place the crop where it keeps the most detail off the monitor split lines
+
+    image may be the source, a reduced preview or open_for_analysis()
+    of the file; image_size is the size of the source the box refers to
+    when image is reduced. The crop has the layout's aspect ratio and
+    covers fill of the constraining dimension. Returns (x1, y1, x2, y2).
+    """
+    image_size = image_size or image.size
+    crop = plan_crops([image_size], layout.aspect_ratio, 'center', fill)[0]
+    crop_width = int(crop[2] - crop[0])
+    crop_height = int(crop[3] - crop[1])
+
+    small = analysis_image(image)
+    energy = energy_map(small)
+    scale_x = energy.shape[1] / image_size[0]
+    scale_y = energy.shape[0] / image_size[1]
+    small_size = (
+        min(energy.shape[1], max(1, round(crop_width * scale_x))),
+        min(energy.shape[0], max(1, round(crop_height * scale_y)))
+    )
+
+    scores, xs, ys = score_positions(energy, small_size, layout.fractions)
+    row, column = np.unravel_index(np.argmax(scores), scores.shape)
+
+    # Back to source pixels, keeping the exact crop size inside the image
+    x = min(max(0, round(xs[column] / scale_x)), image_size[0] - crop_width)
+    y = min(max(0, round(ys[row] / scale_y)), image_size[1] - crop_height)
+    return x, y, x + crop_width, y + crop_height
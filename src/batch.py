@@ -0,0 +1,222 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+from auto_crop import auto_crop_box, open_for_analysis
+from crop_plan import ANCHORS, DEFAULT_FILL
+from cropping import fit_crop_box, initial_crop_box
+from encoder_presets import DEFAULT_PRESET, PRESETS
+from export import draft_for_slices, export_region, export_slices
+from formats import IMAGE_EXTENSIONS
+from layout import MonitorLayout
+from lossless_jpeg import export_lossless
+from region_reader import ACCESS_RAW, ACCESS_TILES, region_access
+
+# Crop placement that looks at the image, on top of the size-only anchors
+AUTO_ANCHOR = 'auto'
+
+def parse_monitors(text):
+    """Parse a left-to-right monitor list like '1920x1080,2560x1440'"""
+    sizes = []
+    for item in text.split(','):
+        width, _, height = item.strip().lower().partition('x')
+        sizes.append((int(width), int(height)))
+    return MonitorLayout.side_by_side(sizes)
+
+def load_layout(path):
+    """Load monitors from a JSON file: [{"width": 1920, "height": 1080}, ...]
+
+    Entries may also give "x" and "y" desktop positions for vertical
+    stacks or offsets; without them monitors are placed left to right.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('monitors', [])
+    if not data:
+        return None
+    if all('x' in m and 'y' in m for m in data):
+        return MonitorLayout([(m['x'], m['y'], m['width'], m['height']) for m in data])
+    return MonitorLayout.side_by_side([(int(m['width']), int(m['height'])) for m in data])
+
+def iter_inputs(source):
+    """Yield image paths from a directory or a glob pattern, lazily"""
+    if os.path.isdir(source):
+        with os.scandir(source) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield entry.path
+    else:
+        for path in glob.iglob(source, recursive=True):
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                yield path
+
+def output_name(path, extension):
+    """Stem and extension every slice of path is saved under, before the monitor suffix"""
+    stem, source_ext = os.path.splitext(os.path.basename(path))
+    return stem, extension or source_ext
+
+def crop_file(path, output_dir, layout, anchor, extension, preset=None, lossless=False, native=True):
+    """Crop and save one wallpaper; runs in a worker process
+
+    With native every slice is resampled once to its monitor's
+    resolution, otherwise slices keep the source pixels of their box.
+    """
+    with Image.open(path) as image:
+        width, height = image.size
+        if anchor == AUTO_ANCHOR:
+            # Scored on a separate, drafted handle so the export still sees full resolution;
+            # the crop covers as much of the image as the GUI's auto crop does
+            with open_for_analysis(path) as probe:
+                box = auto_crop_box(probe, layout, DEFAULT_FILL, image_size=image.size)
+        else:
+            box = initial_crop_box(image.size, layout.aspect_ratio, anchor)
+
+        stem, ext = output_name(path, extension)
+        paths = [os.path.join(output_dir, f"{stem}{suffix}{ext}") for suffix in layout.suffixes()]
+        pixel_jobs = list(zip(layout.map_box(box), paths))
+        if native:
+            jobs = list(zip(layout.map_box_f(fit_crop_box(box, layout.aspect_ratio, image.size)), paths))
+            sizes = layout.sizes()
+        else:
+            jobs = pixel_jobs
+            sizes = None
+
+        # The process pool already uses every core, so encode slices in this worker.
+        # JPEGs can be cut losslessly, raw and tiled sources are read by region
+        # instead of decoded in full, and other JPEGs decode only at the scale
+        # the monitor resolution needs
+        outputs = export_lossless(path, pixel_jobs, max_workers=1) if lossless else None
+        if outputs is None:
+            if region_access(image) in (ACCESS_RAW, ACCESS_TILES):
+                outputs = export_region(path, jobs, max_workers=1, sizes=sizes, preset=preset)
+            else:
+                if sizes:
+                    jobs = draft_for_slices(image, jobs, sizes)
+                image.load()
+                outputs = export_slices(image, jobs, max_workers=1, sizes=sizes, preset=preset)
+
+    return path, width * height / 1_000_000, outputs
+
+def run_batch(inputs, output_dir, layout, anchor='default', extension=None,
+              workers=None, report=print, preset=None, lossless=False, native=True):
+    """Crop every input across a process pool, streaming the inputs
+
+    At most a couple of files per worker are queued at a time, so huge
+    directories do not have to be listed or held in memory up front.
+    Returns (files, megapixels, failures).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    files = failures = 0
+    megapixels = 0.0
+    start = time.perf_counter()
+
+    # Inputs that differ only in their extension would write the same outputs
+    claimed = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        inputs = iter(inputs)
+        exhausted = False
+
+        while pending or not exhausted:
+            # Keep the pool fed without queuing the whole input list
+            while not exhausted and len(pending) < max_in_flight:
+                path = next(inputs, None)
+                if path is None:
+                    exhausted = True
+                    break
+                stem, ext = output_name(path, extension)
+                name = os.path.normcase(stem + ext)
+                if name in claimed:
+                    failures += 1
+                    report(f"Skipping {path}: its wallpapers would overwrite those of {claimed[name]}")
+                    continue
+                claimed[name] = path
+                future = pool.submit(
+                    crop_file, path, output_dir, layout, anchor, extension, preset, lossless, native
+                )
+                pending[future] = path
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    _, image_megapixels, _ = future.result()
+                except Exception as e:
+                    failures += 1
+                    report(f"Error cropping {path}: {str(e)}")
+                    continue
+
+                files += 1
+                megapixels += image_megapixels
+                elapsed = max(time.perf_counter() - start, 1e-9)
+                report(f"[{files}] {path} - {files / elapsed:.1f} files/s, "
+                       f"{megapixels / elapsed:.1f} MP/s")
+
+    return files, megapixels, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='wallcrop batch',
+        description='Crop and split every wallpaper in a directory without the GUI'
+    )
+    parser.add_argument('input', help='input directory or glob pattern')
+    parser.add_argument('-o', '--output', required=True, help='output directory')
+    layout_group = parser.add_mutually_exclusive_group(required=True)
+    layout_group.add_argument('-m', '--monitors', type=parse_monitors,
+                        help='monitor resolutions left to right, e.g. 1920x1080,1920x1080')
+    layout_group.add_argument('-l', '--layout', help='JSON file with the monitor layout')
+    parser.add_argument('-a', '--anchor', choices=ANCHORS + (AUTO_ANCHOR,), default='default',
+                        help="crop placement: 'default' matches the GUI, 'center' is the largest centered crop, "
+                             "'top' keeps the top edge, 'thirds' centers on the upper third line, "
+                             "'auto' places the GUI's auto crop, following the image content and keeping it off the monitor split lines")
+    parser.add_argument('-b', '--bezel', type=int, default=0,
+                        help='pixels hidden behind the bezels between neighbouring monitors')
+    parser.add_argument('-f', '--format', help='output extension, e.g. .png (default: keep the source format)')
+    parser.add_argument('-p', '--preset', choices=PRESETS, default=DEFAULT_PRESET,
+                        help="encoder speed/size trade-off: 'fast', 'balanced' or 'archive'")
+    parser.add_argument('--lossless', action='store_true',
+                        help='cut JPEG outputs from JPEG sources with jpegtran, without re-encoding')
+    parser.add_argument('--source-size', dest='native', action='store_false',
+                        help="keep each slice's source pixels instead of resampling it to the monitor resolution")
+    parser.add_argument('-j', '--jobs', type=int, help='worker processes (default: all CPU cores)')
+    args = parser.parse_args(argv)
+
+    try:
+        layout = args.monitors or load_layout(args.layout)
+    except KeyError as e:
+        parser.error(f"a monitor in {args.layout} has no {e}")
+    except (OSError, ValueError, TypeError) as e:
+        parser.error(f"cannot read the monitor layout {args.layout}: {e}")
+    if not layout:
+        parser.error('the monitor layout is empty')
+    if args.bezel:
+        layout = layout.with_bezels(args.bezel)
+    extension = args.format
+    if extension and not extension.startswith('.'):
+        extension = f'.{extension}'
+
+    start = time.perf_counter()
+    files, megapixels, failures = run_batch(
+        iter_inputs(args.input), args.output, layout, args.anchor, extension, args.jobs,
+        preset=args.preset, lossless=args.lossless, native=args.native
+    )
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Done: {files} files, {megapixels:.1f} MP in {elapsed:.1f}s "
+          f"({files / elapsed:.1f} files/s, {megapixels / elapsed:.1f} MP/s)")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
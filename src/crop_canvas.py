@@ -0,0 +1,135 @@
+from PyQt6.QtCore import Qt, QRect
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QRegion
+from PyQt6.QtWidgets import QWidget
+
+from profiling import profiler
+
+class CropCanvas(QWidget):
+    """Image view that repaints only the crop overlay when the crop box moves
+
+    The scaled image is kept as a persistent layer. Moving the crop box
+    invalidates the strips around the old and new outlines, handles and
+    monitor split lines, plus the part of the tinted fill that changed, so
+    Qt clips the repaint to that region instead of the whole widget.
+    """
+    def __init__(self, handle_size=5, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.handle_size = handle_size
+        self.background = QColor('#2a2a2a')
+        self.image = None
+        self.image_pos = None
+        self.crop_rect = None
+        self.monitor_rects = []
+        self.stats_lines = []
+        self.stats_font = QFont('monospace', 9)
+        self.stats_font.setStyleHint(QFont.StyleHint.Monospace)
+
+    def set_image(self, pixmap, pos):
+        """Replace the image layer; repaints everything"""
+        self.image = pixmap
+        self.image_pos = pos
+        self.update()
+
+    def set_overlay(self, crop_rect, monitor_rects):
+        """Move the crop overlay, repainting only what it covered and now covers"""
+        old_region = self.overlay_region(self.crop_rect, self.monitor_rects)
+        old_rect = self.crop_rect
+        self.crop_rect = QRect(crop_rect) if crop_rect else None
+        self.monitor_rects = list(monitor_rects)
+        new_region = self.overlay_region(self.crop_rect, self.monitor_rects)
+
+        # The tinted fill only changes where the old and new boxes differ
+        fill_region = QRegion(old_rect or QRect()).xored(QRegion(self.crop_rect or QRect()))
+        self.update(old_region.united(new_region).united(fill_region))
+
+    def set_stats(self, lines):
+        """Show profiling text in the top left corner; an empty list hides it"""
+        old_rect = self.stats_rect()
+        self.stats_lines = list(lines)
+        self.update(old_rect.united(self.stats_rect()))
+
+    def stats_rect(self):
+        if not self.stats_lines:
+            return QRect()
+        metrics = QFontMetrics(self.stats_font)
+        width = max(metrics.horizontalAdvance(line) for line in self.stats_lines)
+        return QRect(4, 4, width + 12, metrics.lineSpacing() * len(self.stats_lines) + 8)
+
+    def overlay_region(self, crop_rect, monitor_rects):
+        """Region covered by the outline, handles and split lines of a crop box"""
+        region = QRegion()
+        if not crop_rect:
+            return region
+
+        margin = self.handle_size + 2
+        outer = crop_rect.adjusted(-margin, -margin, margin, margin)
+        inner = crop_rect.adjusted(margin, margin, -margin, -margin)
+        region = QRegion(outer)
+        if inner.isValid():
+            region = region.subtracted(QRegion(inner))
+
+        for rect in monitor_rects:
+            outline = rect.toAlignedRect().adjusted(-1, -1, 1, 1)
+            outline_inner = outline.adjusted(3, 3, -3, -3)
+            line_region = QRegion(outline)
+            if outline_inner.isValid():
+                line_region = line_region.subtracted(QRegion(outline_inner))
+            region = region.united(line_region)
+        return region
+
+    def paintEvent(self, event):
+        with profiler.stage('paint'):
+            painter = QPainter(self)
+            painter.setClipRegion(event.region())
+            painter.fillRect(event.rect(), self.background)
+
+            if self.image is not None and not self.image.isNull():
+                painter.drawPixmap(self.image_pos, self.image)
+
+            if self.crop_rect:
+                self.paint_overlay(painter)
+            if self.stats_lines:
+                self.paint_stats(painter)
+            painter.end()
+
+    def paint_stats(self, painter):
+        rect = self.stats_rect()
+        painter.fillRect(rect, QColor(0, 0, 0, 170))
+        painter.setFont(self.stats_font)
+        painter.setPen(QColor('#7CFC00'))
+        metrics = QFontMetrics(self.stats_font)
+        for index, line in enumerate(self.stats_lines):
+            painter.drawText(rect.x() + 6, rect.y() + 4 + metrics.ascent() + index * metrics.lineSpacing(), line)
+
+    def paint_overlay(self, painter):
+        # Set up semi-transparent white fill
+        painter.setBrush(QColor(255, 255, 255, 30))  # Last parameter is alpha (0-255)
+        painter.setPen(QPen(QColor('#ffffff'), 2))  # White border
+        painter.drawRect(self.crop_rect)
+
+        # Draw each monitor's area, its inner edges show as split lines
+        painter.setPen(QPen(QColor('#ffffff'), 1, Qt.PenStyle.DashLine))  # Dashed white line
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        for rect in self.monitor_rects:
+            painter.drawRect(rect)
+
+        # Draw resize handles
+        handle_size = self.handle_size
+        painter.setPen(QPen(QColor('#ffffff'), 1))
+        painter.setBrush(QColor('#ffffff'))  # Solid white handles
+
+        corners = [
+            self.crop_rect.topLeft(),
+            self.crop_rect.topRight(),
+            self.crop_rect.bottomRight(),
+            self.crop_rect.bottomLeft()
+        ]
+
+        for corner in corners:
+            painter.drawRect(
+                corner.x() - handle_size,
+                corner.y() - handle_size,
+                handle_size * 2,
+                handle_size * 2
+            )
@@ -0,0 +1,69 @@
+import numpy as np
+
+ANCHORS = ('default', 'center', 'top', 'thirds')
+
+# Share of the image the default crop covers, as in the GUI
+DEFAULT_FILL = 0.8
+
+def plan_crops(sizes, aspect_ratio, anchor='default', fill=None):
+    """Plan the crop box of every image in one pass
+
+    sizes is an (N, 2) array of image (width, height). Returns an (N, 4)
+    int64 array of (x1, y1, x2, y2) boxes with the given aspect ratio.
+    The box covers fill of the constraining dimension: DEFAULT_FILL for
+    'default', the largest box that fits for the other anchors. Along
+    the dimension with room to spare, 'default' and 'center' center the
+    box, 'top' keeps it at the top edge and 'thirds' puts its middle on
+    the upper third line, where horizons and faces usually sit.
+    """
+    if anchor not in ANCHORS:
+        raise ValueError(f"Unknown anchor: {anchor}")
+    if fill is None:
+        fill = DEFAULT_FILL if anchor == 'default' else 1.0
+
+    sizes = np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+    width = sizes[:, 0]
+    height = sizes[:, 1]
+
+    # Wider than needed: constrain by height, otherwise by width
+    by_height = width / height > aspect_ratio
+    crop_height_h = np.floor(height * fill)
+    crop_width_h = np.floor(crop_height_h * aspect_ratio)
+    crop_width_w = np.floor(width * fill)
+    crop_height_w = np.floor(crop_width_w / aspect_ratio)
+    crop_width = np.where(by_height, crop_width_h, crop_width_w).astype(np.int64)
+    crop_height = np.where(by_height, crop_height_h, crop_height_w).astype(np.int64)
+
+    x = (width - crop_width) // 2
+    if anchor == 'top':
+        y = np.zeros_like(height)
+    elif anchor == 'thirds':
+        y = np.clip(height // 3 - crop_height // 2, 0, height - crop_height)
+    else:
+        y = (height - crop_height) // 2
+    return np.stack([x, y, x + crop_width, y + crop_height], axis=1)
+
+def map_boxes(boxes, fractions):
+    """Split (N, 4) crop boxes into (N, M, 4) per-monitor boxes
+
+    fractions are a layout's (M, 4) monitor fractions of the crop box.
+    Float boxes are rounded to whole pixels first. Both sides of a shared
+    edge are rounded from the same fraction, half to even like Python's
+    round(), so neighbouring monitors line up.
+    """
+    boxes = np.rint(np.asarray(boxes, dtype=np.float64)).astype(np.int64).reshape(-1, 4)
+    fractions = np.asarray(fractions, dtype=np.float64).reshape(-1, 4)
+    origin = boxes[:, None, :2]
+    size = (boxes[:, 2:] - boxes[:, :2])[:, None, :]
+    offsets = np.rint(fractions[None, :, :] * np.tile(size, 2)).astype(np.int64)
+    return np.tile(origin, 2) + offsets
+
+def plan_monitor_boxes(sizes, layout, anchor='default', fill=None):
+    """Plan the per-monitor source boxes of a whole batch of images
+
+    Returns an (N, M, 4) int64 array, one box per image and monitor of
+    the layout, in the layout's monitor order. Bezel gaps are part of the
+    layout, see MonitorLayout.with_bezels.
+    """
+    crops = plan_crops(sizes, layout.aspect_ratio, anchor, fill)
+    return map_boxes(crops, layout.fractions)
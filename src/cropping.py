@@ -0,0 +1,31 @@
+from crop_plan import plan_crops
+
+def initial_crop_box(image_size, aspect_ratio, anchor='default'):
+    """Get an (x1, y1, x2, y2) crop box with the given aspect ratio
+
+    'default' matches the GUI's starting crop, 80% of the constraining
+    dimension, centered. The other anchors use the largest box that fits,
+    see crop_plan.plan_crops.
+    """
+    return tuple(plan_crops([image_size], aspect_ratio, anchor)[0].tolist())
+
+def fit_crop_box(box, aspect_ratio, image_size):
+    """Make a float (x1, y1, x2, y2) box exactly aspect_ratio and keep it in the image
+
+    The box keeps its width and vertical center; a box that no longer
+    fits is shrunk around its center, then shifted inside the image.
+    """
+    x1, y1, x2, y2 = box
+    image_width, image_height = image_size
+    width = x2 - x1
+    height = width / aspect_ratio
+    center_x = (x1 + x2) / 2
+    center_y = (y1 + y2) / 2
+
+    shrink = max(1.0, width / image_width, height / image_height)
+    width /= shrink
+    height /= shrink
+
+    left = min(max(0.0, center_x - width / 2), image_width - width)
+    top = min(max(0.0, center_y - height / 2), image_height - height)
+    return left, top, left + width, top + height
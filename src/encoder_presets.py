@@ -0,0 +1,125 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+# Pillow is imported where it is needed, so the window can list the
+# presets at startup without loading it
+PRESETS = ('fast', 'balanced', 'archive')
+DEFAULT_PRESET = 'balanced'
+
+# Pillow save() options per format and preset. Wallpapers are looked at
+# up close, so everything past "fast" keeps full chroma resolution
+FORMAT_PRESETS = {
+    'JPEG': {
+        'fast': {'quality': 85, 'subsampling': '4:2:0'},
+        'balanced': {'quality': 92, 'subsampling': '4:4:4', 'optimize': True},
+        'archive': {'quality': 95, 'subsampling': '4:4:4', 'optimize': True, 'progressive': True},
+    },
+    'PNG': {
+        'fast': {'compress_level': 1},
+        'balanced': {'compress_level': 6},
+        'archive': {'compress_level': 9},
+    },
+    'WEBP': {
+        'fast': {'quality': 85, 'method': 0},
+        'balanced': {'quality': 90, 'method': 4},
+        'archive': {'lossless': True, 'quality': 90, 'method': 4},
+    },
+    'AVIF': {
+        'fast': {'quality': 80, 'speed': 10, 'max_threads': os.cpu_count() or 1},
+        'balanced': {'quality': 85, 'speed': 8, 'max_threads': os.cpu_count() or 1},
+        'archive': {'quality': 90, 'speed': 6, 'subsampling': '4:4:4', 'max_threads': os.cpu_count() or 1},
+    },
+}
+
+# Extensions offered for each format in the save dialog
+FORMAT_EXTENSIONS = {
+    'JPEG': ('.jpg', '.jpeg'),
+    'PNG': ('.png',),
+    'WEBP': ('.webp',),
+    'AVIF': ('.avif',),
+}
+
+# Monitor slices the benchmark encodes: 4K and 5K
+BENCHMARK_SIZES = ((3840, 2160), (5120, 2880))
+
+def supported_formats():
+    """Preset formats this Pillow build can write (WebP and AVIF are optional)"""
+    from PIL import Image
+    Image.init()
+    return [name for name in FORMAT_PRESETS if name in Image.SAVE]
+
+def supported_extensions():
+    """File extensions of the supported formats, e.g. ['.png', '.jpg', '.jpeg']"""
+    return [ext for name in supported_formats() for ext in FORMAT_EXTENSIONS[name]]
+
+def preset_params(image_format, preset=None):
+    """Get the save() options of a preset for a Pillow format name
+
+    Formats without presets get no options, i.e. Pillow's defaults.
+    """
+    preset = preset or DEFAULT_PRESET
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown encoder preset: {preset}")
+    return dict(FORMAT_PRESETS.get(image_format, {}).get(preset, {}))
+
+def benchmark_image(size):
+    """Synthetic photo-like test image: smooth gradients, sharp detail and sensor noise"""
+    from PIL import Image
+    detail = Image.effect_mandelbrot(size, (-2.2, -1.2, 1.0, 1.2), 100)
+    gradient = Image.linear_gradient('L').resize(size, Image.Resampling.BILINEAR)
+    noise = Image.effect_noise(size, 8)
+    return Image.merge('RGB', (
+        Image.blend(detail, gradient, 0.5),
+        gradient,
+        Image.blend(gradient.transpose(Image.Transpose.ROTATE_180), noise, 0.1)
+    ))
+
+def benchmark(source=None, sizes=BENCHMARK_SIZES, repeat=1, report=print):
+    """Encode monitor-sized slices with every preset of every supported format
+
+    Returns rows of (format, preset, size, seconds, bytes); seconds is the
+    best of repeat runs.
+    """
+    from PIL import Image
+    rows = []
+    for size in sizes:
+        if source is not None:
+            image = source.convert('RGB').resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        else:
+            image = benchmark_image(size)
+
+        for image_format in supported_formats():
+            for preset in PRESETS:
+                params = preset_params(image_format, preset)
+                best = None
+                for _ in range(repeat):
+                    buffer = io.BytesIO()
+                    start = time.perf_counter()
+                    image.save(buffer, format=image_format, **params)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                output_bytes = buffer.tell()
+                rows.append((image_format, preset, size, best, output_bytes))
+                report(f"{image_format:5} {preset:9} {size[0]}x{size[1]}  "
+                       f"{best * 1000:8.0f} ms  {output_bytes / 1_000_000:7.2f} MB")
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='encoder_presets',
+        description='Report encode time and output size of every export preset'
+    )
+    parser.add_argument('image', nargs='?', help='source image to resize into the slices (default: synthetic)')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='encodes per preset, the best is reported')
+    args = parser.parse_args(argv)
+
+    from PIL import Image
+    source = Image.open(args.image) if args.image else None
+    benchmark(source, repeat=args.repeat)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
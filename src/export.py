@@ -0,0 +1,230 @@
+import math
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from encoder_presets import preset_params
+from image_pyramid import reducible
+from profiling import profiler
+from region_reader import read_region
+
+def read_umask():
+    """The process umask, read from /proc where possible
+
+    Elsewhere it can only be read by setting it, which briefly changes it
+    for every thread; that fallback runs once, on the main thread, when
+    this module is imported (see WallpaperCropper.finish_startup).
+    """
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    umask = os.umask(0o077)
+    os.umask(umask)
+    return umask
+
+# mkstemp creates files readable only by the owner; exported wallpapers
+# should get the same permissions as any other new file
+_UMASK = read_umask()
+
+# Filter slices are resampled to their monitor's resolution with
+DEFAULT_RESAMPLE = Image.Resampling.LANCZOS
+
+# Downscales by more than this factor first reduce() by a whole factor
+# (box filter) and resample only the rest, as Image.thumbnail does. 3.0
+# is indistinguishable from a full Lanczos pass
+REDUCING_GAP = 3.0
+
+# Modes the formats that cannot convert on their own store; anything
+# else is converted first, see convert_for_format()
+SAVE_MODES = {
+    'JPEG': ('1', 'L', 'RGB', 'CMYK'),
+    'PNG': ('1', 'L', 'LA', 'I;16', 'P', 'RGB', 'RGBA'),
+    'BMP': ('1', 'L', 'P', 'RGB', 'RGBA'),
+}
+
+# Transparent pixels are flattened onto this color for formats without alpha
+FLATTEN_BACKGROUND = (0, 0, 0)
+
+def image_format(path):
+    """Get the Pillow format name for a file path from its extension"""
+    ext = os.path.splitext(path)[1].lower()
+    image_format = Image.registered_extensions().get(ext)
+    if image_format is None:
+        raise ValueError(f"Unsupported output format: {ext or path}")
+    return image_format
+
+def convert_for_format(image, output_format):
+    """Get image in a mode output_format can store
+
+    Grayscale stays grayscale and alpha is kept where the format has it;
+    otherwise transparent pixels are flattened onto FLATTEN_BACKGROUND.
+    16-bit and float samples are scaled down for 8-bit formats.
+    """
+    modes = SAVE_MODES.get(output_format)
+    if modes is None or image.mode in modes:
+        return image
+
+    gray = image.mode in ('1', 'L', 'LA', 'La', 'I', 'I;16', 'F')
+    alpha = image.mode in ('LA', 'La', 'PA', 'RGBA', 'RGBa') or 'transparency' in image.info
+    if image.mode in ('I', 'I;16'):
+        if 'I;16' in modes:
+            return image.convert('I;16')
+        image = image.convert('I').point(lambda value: value / 256)
+    if alpha:
+        target = 'LA' if gray and 'LA' in modes else 'RGBA'
+        if target in modes:
+            return image.convert(target)
+        rgba = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, FLATTEN_BACKGROUND)
+        flattened.paste(rgba, mask=rgba.getchannel('A'))
+        return flattened.convert('L') if gray else flattened
+    return image.convert('L' if gray else 'RGB')
+
+def encode_to_temp(image, path, preset=None, **params):
+    """Encode image into a hidden temp file next to path and return its name
+
+    image is converted to a mode the path's format can store. The
+    encoder preset's options for that format apply first, explicit
+    params override them.
+    """
+    output_format = image_format(path)
+    params = {**preset_params(output_format, preset), **params}
+    fd, temp_path = make_temp(path)
+    try:
+        with os.fdopen(fd, 'wb') as f, profiler.stage('encode', format=output_format):
+            image = convert_for_format(image, output_format)
+            image.save(f, format=output_format, **params)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+def make_temp(path):
+    """Create a hidden temp file next to path, returning (fd, temp_path)"""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+    os.chmod(temp_path, 0o666 & ~_UMASK)
+    return fd, temp_path
+
+def publish(results, jobs):
+    """Rename (temp_path, error) results of (box, path) jobs into place, all or nothing"""
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        for temp_path, _ in results:
+            if temp_path is not None:
+                os.unlink(temp_path)
+        raise errors[0]
+
+    with profiler.stage('write', files=len(jobs)):
+        for (temp_path, _), (_, path) in zip(results, jobs):
+            os.replace(temp_path, path)
+    return [path for _, path in jobs]
+
+def save_atomic(image, path, **params):
+    """Save image so that path is either left untouched or fully written"""
+    temp_path = encode_to_temp(image, path, **params)
+    os.replace(temp_path, path)
+
+def crop_slice(image, box, size=None, resample=DEFAULT_RESAMPLE):
+    """Cut a box out of image
+
+    Without a size the box is rounded to whole pixels and cropped. With
+    a size the box may be fractional and is resampled straight to that
+    size, so the slice matches its monitor exactly in a single pass;
+    large downscales reduce() by REDUCING_GAP first.
+    """
+    if size is None:
+        return image.crop(tuple(round(v) for v in box))
+
+    x1, y1, x2, y2 = box
+    if reducible(image) is not image:
+        # Convert just the covered pixels, not the whole source
+        left, top = math.floor(x1), math.floor(y1)
+        image = reducible(image.crop((left, top, math.ceil(x2), math.ceil(y2))))
+        box = (x1 - left, y1 - top, x2 - left, y2 - top)
+    return image.resize(size, resample, box=box, reducing_gap=REDUCING_GAP)
+
+def draft_for_slices(image, jobs, sizes):
+    """Let a not yet loaded JPEG decode at a DCT-reduced scale for resampled jobs
+
+    The scale keeps every slice at least REDUCING_GAP times its output
+    size, so quality is unchanged. Returns the jobs with their boxes
+    moved to the drafted image's pixels.
+    """
+    source_width, source_height = image.size
+    scale = max(
+        width / (x2 - x1) if axis == 0 else height / (y2 - y1)
+        for ((x1, y1, x2, y2), _), (width, height) in zip(jobs, sizes)
+        for axis in (0, 1)
+    )
+    requested = (
+        math.ceil(source_width * min(1.0, scale * REDUCING_GAP)),
+        math.ceil(source_height * min(1.0, scale * REDUCING_GAP))
+    )
+    drafted = image.draft(None, requested)
+    if drafted is None:
+        return jobs
+
+    # The reduced image may be padded up to whole pixels; scale by the DCT factor
+    _, (_, _, scaled_width, scaled_height) = drafted
+    factor_x = scaled_width / source_width
+    factor_y = scaled_height / source_height
+    return [
+        ((x1 * factor_x, y1 * factor_y, x2 * factor_x, y2 * factor_y), path)
+        for (x1, y1, x2, y2), path in jobs
+    ]
+
+def export_slices(image, jobs, max_workers=None, sizes=None, resample=DEFAULT_RESAMPLE, **params):
+    """Crop and encode (box, path) jobs concurrently, then publish them together
+
+    sizes, if given, are the output (width, height) of each job, see
+    crop_slice(). Pillow releases the GIL while resampling and encoding,
+    so each monitor slice gets its own thread. Every slice is written to
+    a temp file first and all of them are renamed into place only once
+    every encode has succeeded, so a failed export never replaces
+    existing wallpapers.
+    """
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+    sizes = sizes or [None] * len(jobs)
+
+    work = [(image, box, path, size, resample, params) for (box, path), size in zip(jobs, sizes)]
+    if max_workers <= 1:
+        results = [_try_encode(*args) for args in work]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wallcrop-encode') as pool:
+            futures = [pool.submit(_try_encode, *args) for args in work]
+            results = [future.result() for future in futures]
+    return publish(results, jobs)
+
+def _try_encode(image, box, path, size, resample, params):
+    try:
+        with profiler.stage('crop', size=size):
+            image = crop_slice(image, box, size, resample)
+        return encode_to_temp(image, path, **params), None
+    except Exception as e:
+        return None, e
+
+def export_region(path, jobs, max_workers=None, sizes=None, resample=DEFAULT_RESAMPLE, **params):
+    """Export (box, path) jobs by decoding only the region they cover
+
+    Peak memory is bounded by the union of the boxes rather than the
+    source image, for the formats region_reader can read partially.
+    """
+    left = math.floor(min(box[0] for box, _ in jobs))
+    top = math.floor(min(box[1] for box, _ in jobs))
+    right = math.ceil(max(box[2] for box, _ in jobs))
+    bottom = math.ceil(max(box[3] for box, _ in jobs))
+    region = read_region(path, (left, top, right, bottom))
+
+    shifted_jobs = [
+        ((x1 - left, y1 - top, x2 - left, y2 - top), output_path)
+        for (x1, y1, x2, y2), output_path in jobs
+    ]
+    return export_slices(region, shifted_jobs, max_workers, sizes, resample, **params)
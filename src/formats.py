@@ -0,0 +1,6 @@
+# File extensions opened as source images, by the window, the library and batch mode
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.ppm', '.pgm', '.pnm')
+
+def open_filter():
+    """File dialog filter listing IMAGE_EXTENSIONS"""
+    return "Images ({})".format(' '.join(f'*{ext}' for ext in IMAGE_EXTENSIONS))
@@ -0,0 +1,124 @@
+import math
+import time
+from collections import deque
+
+from PyQt6.QtCore import QObject, Qt, QTimer
+
+from profiling import profiler
+
+# Regions of the window that can be marked dirty independently
+REGION_IMAGE = 'image'
+REGION_OVERLAY = 'overlay'
+REGION_PREVIEWS = 'previews'
+
+# Timers fire a little late; a region this close to due counts as due
+FRAME_SLACK = 0.002
+
+class FrameScheduler(QObject):
+    """Coalesce repaint requests into at most one frame per display refresh
+
+    Requests only mark regions dirty; the frame timer is started once and
+    never restarted, so a stream of mouse moves cannot starve it. Frames
+    are aligned to the refresh interval. Throttled regions (the previews)
+    render at an adaptive rate so that their measured cost stays within a
+    share of wall time.
+    """
+    def __init__(self, render, refresh_rate=60.0, parent=None):
+        super().__init__(parent)
+        self._render = render
+        self.frame_interval = 1.0 / (refresh_rate or 60.0)
+        self._epoch = time.perf_counter()
+        self._dirty = set()
+        self._budgets = {}
+        self._costs = {}
+        self._last_run = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._frame)
+
+        # Frame-time statistics
+        self.frames = 0
+        self._frame_times = deque(maxlen=240)
+        self._frame_starts = deque(maxlen=240)
+
+    def set_throttled(self, region, budget):
+        """Render region at most often enough to spend budget (0-1) of wall time on it"""
+        self._budgets[region] = budget
+
+    def record_cost(self, region, seconds):
+        """Report how long rendering a region took, e.g. from a worker thread's result"""
+        previous = self._costs.get(region)
+        self._costs[region] = seconds if previous is None else previous * 0.7 + seconds * 0.3
+
+    def region_interval(self, region):
+        """Minimum time between two renders of a region"""
+        budget = self._budgets.get(region)
+        if not budget:
+            return self.frame_interval
+        return max(self.frame_interval, self._costs.get(region, 0.0) / budget)
+
+    def request(self, *regions):
+        """Mark regions dirty; they are rendered together on the next frame"""
+        self._dirty.update(regions)
+        self._schedule()
+
+    def flush(self):
+        """Render every dirty region now, ignoring throttling"""
+        self._timer.stop()
+        if self._dirty:
+            self._run(set(self._dirty), time.perf_counter())
+
+    def _next_due(self, now):
+        return min(
+            self._last_run.get(region, 0.0) + self.region_interval(region)
+            for region in self._dirty
+        ) if self._dirty else now
+
+    def _schedule(self):
+        if self._timer.isActive() or not self._dirty:
+            return
+
+        # Wait for the next refresh boundary at or after the earliest due region
+        now = time.perf_counter()
+        due = max(now, self._next_due(now) - FRAME_SLACK)
+        elapsed = due - self._epoch
+        frame_time = self._epoch + math.ceil(elapsed / self.frame_interval) * self.frame_interval
+        self._timer.start(max(0, math.ceil((frame_time - now) * 1000)))
+
+    def _frame(self):
+        now = time.perf_counter()
+        due = {
+            region for region in self._dirty
+            if now - self._last_run.get(region, 0.0) >= self.region_interval(region) - FRAME_SLACK
+        }
+        if due:
+            self._run(due, now)
+        self._schedule()
+
+    def _run(self, regions, now):
+        self._dirty -= regions
+        for region in regions:
+            self._last_run[region] = now
+
+        start = time.perf_counter()
+        with profiler.stage('frame', regions=sorted(regions)):
+            self._render(regions)
+        self._frame_times.append(time.perf_counter() - start)
+        self._frame_starts.append(start)
+        self.frames += 1
+
+    def stats(self):
+        """Frame-time statistics over the most recent frames"""
+        times = sorted(self._frame_times)
+        span = self._frame_starts[-1] - self._frame_starts[0] if len(self._frame_starts) > 1 else 0.0
+        return {
+            'frames': self.frames,
+            'fps': (len(self._frame_starts) - 1) / span if span else 0.0,
+            'avg_ms': sum(times) / len(times) * 1000 if times else 0.0,
+            'p95_ms': times[max(0, int(len(times) * 0.95) - 1)] * 1000 if times else 0.0,
+            'max_ms': times[-1] * 1000 if times else 0.0,
+            'costs_ms': {region: cost * 1000 for region, cost in self._costs.items()},
+            'intervals_ms': {region: self.region_interval(region) * 1000 for region in self._budgets},
+        }
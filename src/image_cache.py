@@ -0,0 +1,146 @@
+import os
+from collections import OrderedDict
+
+# Memory allowed for all cached images together, overridable in MB with WALLCROP_CACHE_MB
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+def cache_budget():
+    """Byte budget for the image cache, from WALLCROP_CACHE_MB if set"""
+    value = os.environ.get('WALLCROP_CACHE_MB')
+    if not value:
+        return DEFAULT_CACHE_BYTES
+    try:
+        return max(0, int(value)) * 1024 * 1024
+    except ValueError:
+        print(f"Ignoring invalid WALLCROP_CACHE_MB: {value}")
+        return DEFAULT_CACHE_BYTES
+
+def file_key(path):
+    """Identify a file version by path, modification time and size"""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+class CacheEntry:
+    """Everything needed to show an image again without decoding it
+
+    crop_box is the last crop in source pixels, so it survives a change
+    of view size. pixmap is the scaled display image for pixmap_view_size.
+    Prefetched entries carry display_image instead, a QImage prepared off
+    the GUI thread for display_view_size, until they are first shown.
+    """
+    def __init__(self, key, loaded_image, pyramid):
+        self.key = key
+        self.loaded_image = loaded_image
+        self.pyramid = pyramid
+        self.pixmap = None
+        self.pixmap_view_size = None
+        self.display_image = None
+        self.display_view_size = None
+        self.crop_box = None
+        self.prefetched = False
+
+    def nbytes(self):
+        """Approximate memory held by the entry"""
+        from image_pyramid import image_bytes
+        loaded = self.loaded_image
+        total = image_bytes(loaded.preview) + self.pyramid.cached_bytes
+        if loaded.is_reduced and loaded.is_full_ready():
+            try:
+                total += image_bytes(loaded.full())
+            except Exception:
+                pass
+        if self.pixmap is not None:
+            total += self.pixmap.width() * self.pixmap.height() * 4
+        if self.display_image is not None:
+            total += self.display_image.sizeInBytes()
+        return total
+
+class ImageCache:
+    """LRU cache of decoded images keyed by path, mtime and size
+
+    Entries are evicted least recently used first once their combined
+    size exceeds max_bytes. The most recently used entry is always kept,
+    it is the one on screen. Entries grow while in use (pyramid levels,
+    the full decode), so the budget is enforced again on every access.
+    Prefetched entries rank right behind the entry on screen, ahead of
+    images viewed earlier, and are not listed by recent() until shown.
+    """
+    def __init__(self, max_bytes=None):
+        self.max_bytes = cache_budget() if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._entries
+
+    def get(self, path):
+        """Get the entry for path if the file has not changed since it was cached"""
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        try:
+            key = file_key(path)
+        except OSError:
+            key = None
+        if key != entry.key:
+            self.discard(path)
+            return None
+        self._entries.move_to_end(path)
+        self.trim()
+        return entry
+
+    def put(self, entry, prefetched=False):
+        """Add or replace an entry and make it the most recently used"""
+        path = entry.key[0]
+        old = self._entries.pop(path, None)
+        if old is not None and old is not entry:
+            old.loaded_image.cancel()
+        entry.prefetched = prefetched
+        self._entries[path] = entry
+
+        # Keep the entry on screen, the last one shown, the most recently used
+        if prefetched:
+            shown = next((p for p, e in reversed(self._entries.items()) if not e.prefetched), None)
+            if shown is not None:
+                self._entries.move_to_end(shown)
+        self.trim()
+
+    def discard(self, path):
+        entry = self._entries.pop(os.path.abspath(path), None)
+        if entry is not None:
+            entry.loaded_image.cancel()
+
+    def recent(self):
+        """Cached paths that have been shown, most recently used first"""
+        return [path for path, entry in reversed(self._entries.items()) if not entry.prefetched]
+
+    @property
+    def total_bytes(self):
+        return sum(entry.nbytes() for entry in self._entries.values())
+
+    def trim(self):
+        """Evict least recently used entries until the cache fits its budget
+
+        Full-resolution decodes of reduced images are only needed for
+        export and come back in the background, so they are released
+        before whole entries are evicted.
+        """
+        sizes = {path: entry.nbytes() for path, entry in self._entries.items()}
+        total = sum(sizes.values())
+        for path in list(self._entries)[:-1]:
+            if total <= self.max_bytes:
+                return
+            entry = self._entries[path]
+            if entry.loaded_image.is_reduced and entry.loaded_image.is_full_ready():
+                entry.loaded_image.release_full()
+                total -= sizes[path]
+                sizes[path] = entry.nbytes()
+                total += sizes[path]
+
+        while total > self.max_bytes and len(self._entries) > 1:
+            path, entry = self._entries.popitem(last=False)
+            entry.loaded_image.cancel()
+            total -= sizes[path]
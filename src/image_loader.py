@@ -0,0 +1,147 @@
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from PIL import Image
+
+from image_pyramid import reducible
+from profiling import profiler
+from region_reader import ACCESS_RAW, ACCESS_TILES, iter_bands, region_access
+
+# Rows decoded per step when building a preview without a full decode,
+# in multiples of the reduction factor
+PREVIEW_BAND_ROWS = 64
+
+# Full-resolution decodes run here; Pillow releases the GIL while decoding
+_decode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='wallcrop-decode')
+
+def decode_full(path):
+    """Open and fully decode an image file"""
+    with profiler.stage('decode', path=path, full=True):
+        image = Image.open(path)
+        image.load()
+    return image
+
+class LoadedImage:
+    """A source image that can be shown before its full decode finishes
+
+    preview is a reduced decode used for display and previews, while
+    size is always the full-resolution size so crop coordinates stay in
+    source pixel space. full() returns the full-resolution image, waiting
+    for the background decode if needed. streamable images support
+    region_reader.read_region, so export never needs full().
+    """
+    def __init__(self, path, preview, size, full_future=None, streamable=False):
+        self.path = path
+        self.preview = preview
+        self.size = size
+        self.mode = preview.mode
+        self.streamable = streamable
+        self._full_future = full_future
+        # full() runs on export workers while the GUI thread may release
+        # or cancel the decode
+        self._lock = threading.Lock()
+
+    @property
+    def is_reduced(self):
+        return self.preview.size != self.size
+
+    def is_full_ready(self):
+        if not self.is_reduced:
+            return True
+        return self._full_future is not None and self._full_future.done()
+
+    def prepare_full(self):
+        """Start the full decode in the background if it is not running already
+
+        Streamable images are left alone: export reads just the crop from
+        them, and a full decode would undo that memory bound.
+        """
+        if self.is_reduced and not self.streamable:
+            self._full_decode()
+
+    def _full_decode(self):
+        with self._lock:
+            if self._full_future is None:
+                self._full_future = _decode_executor.submit(decode_full, self.path)
+            return self._full_future
+
+    def full(self):
+        """Get the full-resolution image"""
+        if not self.is_reduced:
+            return self.preview
+        while True:
+            try:
+                return self._full_decode().result()
+            except CancelledError:
+                # Cancelled by the GUI thread before it started; decode again
+                continue
+
+    def release_full(self):
+        """Drop the full-resolution decode of a reduced image; full() redoes it"""
+        if self.is_reduced:
+            with self._lock:
+                if self._full_future is not None:
+                    self._full_future.cancel()
+                self._full_future = None
+
+    def cancel(self):
+        """Cancel the full decode if it has not started yet"""
+        # A cancelled decode is submitted again by the next full() call
+        with self._lock:
+            if self._full_future is not None and self._full_future.cancel():
+                self._full_future = None
+
+def reduction_factor(size, preview_size):
+    """Largest power of two the image can shrink by and still cover preview_size"""
+    width, height = size
+    preview_width, preview_height = preview_size
+    factor = 1
+    while width // (factor * 2) >= preview_width and height // (factor * 2) >= preview_height:
+        factor *= 2
+    return factor
+
+def banded_preview(path, size, factor):
+    """Build a reduced preview from row bands, never holding the full image"""
+    width, height = size
+    preview = None
+    with profiler.stage('decode', path=path, factor=factor):
+        for top, band in iter_bands(path, PREVIEW_BAND_ROWS * factor):
+            band = reducible(band).reduce(factor)
+            if preview is None:
+                preview = Image.new(band.mode, (-(-width // factor), -(-height // factor)))
+            preview.paste(band, (0, top // factor))
+    return preview
+
+def load_image(path, preview_size, start_full=True):
+    """Decode a fast preview of path and start the full decode in the background
+
+    JPEGs are decoded with draft(), which lets libjpeg scale by 1/2, 1/4
+    or 1/8 in the DCT domain while staying at least preview_size. Raw and
+    tiled files that can be read by region are reduced band by band and
+    never fully decoded; export reads just the crop from them. Other
+    formats have no cheap reduced decode and are loaded in full.
+    With start_full=False the full decode waits for prepare_full().
+    """
+    # Streamable files are read by region later, each read opening its own handle
+    with Image.open(path) as probe:
+        full_size = probe.size
+        access = region_access(probe)
+
+    if access in (ACCESS_RAW, ACCESS_TILES):
+        factor = reduction_factor(full_size, preview_size)
+        if factor > 1:
+            return LoadedImage(path, banded_preview(path, full_size, factor), full_size, streamable=True)
+
+    image = Image.open(path)
+    if image.format == 'JPEG':
+        image.draft(image.mode, preview_size)
+
+    with profiler.stage('decode', path=path, preview=True):
+        image.load()
+    if image.size == full_size:
+        return LoadedImage(path, image, full_size)
+
+    loaded_image = LoadedImage(path, image, full_size)
+    if start_full:
+        loaded_image.prepare_full()
+    return loaded_image
@@ -0,0 +1,155 @@
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from profiling import profiler
+
+# Memory allowed for the reduced levels of one image (the source is not counted)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def fit_size(size, bounds):
+    """Scale size to fit inside bounds keeping its aspect ratio
+
+    Uses the same integer math as QSize.scaled with KeepAspectRatio.
+    """
+    width, height = size
+    max_width, max_height = bounds
+    fitted_width = max_height * width // height
+    if fitted_width <= max_width:
+        return fitted_width, max_height
+    return max_width, max_width * height // width
+
+def image_bytes(image):
+    """Approximate memory used by a decoded PIL image"""
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+def reducible(image):
+    """Get a copy of image in a mode Image.reduce can average meaningfully"""
+    if image.mode == 'P':
+        has_alpha = 'transparency' in image.info
+        return image.convert('RGBA' if has_alpha else 'RGB')
+    if image.mode == 'PA':
+        return image.convert('RGBA')
+    if image.mode == '1':
+        return image.convert('L')
+    if image.mode == 'I;16':
+        return image.convert('I')
+    return image
+
+class ImagePyramid:
+    """Multi-resolution copies of a source image for display and previews
+
+    Level 0 is the given image itself. Every further level halves the
+    previous one until a level would be smaller than min_size in both
+    dimensions. Levels and regions are read from a copy of the image
+    converted once by reducible(), not from the image itself. Levels are built on first use from the nearest larger
+    level and kept in an LRU cache capped at max_bytes.
+
+    source_size is the full-resolution size that region() boxes refer to;
+    it differs from image.size when image is a reduced decode. Levels may
+    be requested from worker threads.
+    """
+    def __init__(self, image, min_size, max_bytes=DEFAULT_MAX_BYTES, source_size=None):
+        self.source = image
+        self._base = reducible(image)
+        self.source_size = source_size or image.size
+        self.max_bytes = max_bytes
+        self._levels = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+        # Work out the size of each level up front
+        self.level_sizes = [image.size]
+        width, height = image.size
+        min_width, min_height = min_size
+        while True:
+            width, height = (width + 1) // 2, (height + 1) // 2
+            if width < min_width and height < min_height:
+                break
+            self.level_sizes.append((width, height))
+            if width == 1 and height == 1:
+                break
+
+    @property
+    def cached_bytes(self):
+        return self._cached_bytes
+
+    def level_index_for(self, width, height):
+        """Index of the smallest level at least width x height"""
+        for index in range(len(self.level_sizes) - 1, 0, -1):
+            level_width, level_height = self.level_sizes[index]
+            if level_width >= width and level_height >= height:
+                return index
+        return 0
+
+    def level_for(self, width, height):
+        """Smallest level that is at least width x height"""
+        return self.level(self.level_index_for(width, height))
+
+    def level(self, index):
+        """Get a level, building it from the nearest larger cached level"""
+        if index == 0:
+            return self.source
+
+        with self._lock:
+            image = self._levels.get(index)
+            if image is not None:
+                self._levels.move_to_end(index)
+                return image
+
+            # Find the nearest larger level still in the cache
+            parent_index = index - 1
+            while parent_index > 0 and parent_index not in self._levels:
+                parent_index -= 1
+            image = self._base if parent_index == 0 else self._levels[parent_index]
+
+            # Halve one level at a time so intermediate levels get cached too
+            with profiler.stage('scale', level=index):
+                for level_index in range(parent_index + 1, index + 1):
+                    image = image.reduce(2)
+                    self._store(level_index, image)
+            return image
+
+    def region(self, box, size, resample=Image.Resampling.BILINEAR):
+        """Render a source-pixel box at the given output size
+
+        Reads from the smallest level whose copy of the box still covers
+        size, so the cost depends on the output size, not the source.
+        """
+        x1, y1, x2, y2 = box
+        width, height = size
+        source_width, source_height = self.source_size
+        box_width = max(1, x2 - x1)
+        box_height = max(1, y2 - y1)
+
+        index = 0
+        for candidate in range(len(self.level_sizes) - 1, 0, -1):
+            level_width, level_height = self.level_sizes[candidate]
+            if (box_width * level_width / source_width >= width
+                    and box_height * level_height / source_height >= height):
+                index = candidate
+                break
+
+        image = self._base if index == 0 else self.level(index)
+        level_width, level_height = self.level_sizes[index]
+        scale_x = level_width / source_width
+        scale_y = level_height / source_height
+        level_box = (x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y)
+        return image.resize(size, resample, box=level_box)
+
+    def clear(self):
+        """Drop every cached level"""
+        with self._lock:
+            self._levels.clear()
+            self._cached_bytes = 0
+
+    def _store(self, index, image):
+        self._levels[index] = image
+        self._cached_bytes += image_bytes(image)
+
+        # Evict least recently used levels, never the one just stored
+        while self._cached_bytes > self.max_bytes and len(self._levels) > 1:
+            _, evicted = self._levels.popitem(last=False)
+            self._cached_bytes -= image_bytes(evicted)
@@ -0,0 +1,93 @@
+class MonitorLayout:
+    """Monitor rectangles in desktop coordinates and the crop-to-monitor mapping
+
+    Monitors are (x, y, width, height) tuples as reported by the OS, so
+    mixed resolutions, vertical stacks and offsets are all supported. The
+    crop box covers the bounding box of every monitor; each monitor's share
+    of it is precomputed once as fractions, so mapping a crop box to N
+    output boxes is a single pass over those fractions.
+    """
+    def __init__(self, monitors):
+        if not monitors:
+            raise ValueError("A monitor layout needs at least one monitor")
+
+        # Order left to right, then top to bottom, so output names are stable
+        self.monitors = sorted(
+            (tuple(int(v) for v in monitor) for monitor in monitors),
+            key=lambda m: (m[0], m[1])
+        )
+        left = min(x for x, _, _, _ in self.monitors)
+        top = min(y for _, y, _, _ in self.monitors)
+        right = max(x + width for x, _, width, _ in self.monitors)
+        bottom = max(y + height for _, y, _, height in self.monitors)
+        self.width = right - left
+        self.height = bottom - top
+        self.aspect_ratio = self.width / self.height
+
+        self.fractions = [
+            ((x - left) / self.width, (y - top) / self.height,
+             (x + width - left) / self.width, (y + height - top) / self.height)
+            for x, y, width, height in self.monitors
+        ]
+
+    @classmethod
+    def side_by_side(cls, sizes):
+        """Build a layout of (width, height) monitors placed left to right, top aligned"""
+        monitors = []
+        x = 0
+        for width, height in sizes:
+            monitors.append((x, 0, width, height))
+            x += width
+        return cls(monitors)
+
+    def with_bezels(self, bezel_x, bezel_y=None):
+        """Get a copy with bezel_x pixels between side-by-side monitors
+
+        Monitors in the second column move right by one gap, in the third
+        by two and so on; bezel_y (defaulting to bezel_x) does the same
+        for rows. The part of the picture behind the bezels is left out,
+        so lines continue straight across monitor edges.
+        """
+        bezel_y = bezel_x if bezel_y is None else bezel_y
+        columns = sorted({x for x, _, _, _ in self.monitors})
+        rows = sorted({y for _, y, _, _ in self.monitors})
+        return MonitorLayout([
+            (x + columns.index(x) * bezel_x, y + rows.index(y) * bezel_y, width, height)
+            for x, y, width, height in self.monitors
+        ])
+
+    def __len__(self):
+        return len(self.monitors)
+
+    def map_box(self, box):
+        """Map an (x1, y1, x2, y2) crop box to one integer box per monitor
+
+        Neighbouring monitors share edges exactly, since both sides of an
+        edge are rounded from the same fraction.
+        """
+        # NumPy is only loaded once a crop is mapped, not at startup
+        from crop_plan import map_boxes
+        return [tuple(monitor_box) for monitor_box in map_boxes(box, self.fractions)[0].tolist()]
+
+    def map_box_f(self, box):
+        """Like map_box, without rounding, for overlays and resampled export"""
+        x1, y1, x2, y2 = box
+        width = x2 - x1
+        height = y2 - y1
+        return [
+            (x1 + fx1 * width, y1 + fy1 * height, x1 + fx2 * width, y1 + fy2 * height)
+            for fx1, fy1, fx2, fy2 in self.fractions
+        ]
+
+    def sizes(self):
+        """(width, height) of every monitor, in the layout's monitor order"""
+        return [(width, height) for _, _, width, height in self.monitors]
+
+    def suffixes(self):
+        """File name suffixes for each monitor's wallpaper"""
+        if len(self.monitors) == 2:
+            (x_a, y_a, width_a, _), (x_b, y_b, _, _) = self.monitors
+            if x_a + width_a <= x_b:
+                return ['_left', '_right']
+            return ['_top', '_bottom'] if y_a < y_b else ['_bottom', '_top']
+        return [f'_monitor{index + 1}' for index in range(len(self.monitors))]
@@ -0,0 +1,209 @@
+import hashlib
+import io
+import os
+import sqlite3
+
+from PIL import Image
+
+from formats import IMAGE_EXTENSIONS
+
+# Longest side of a stored thumbnail
+THUMBNAIL_SIZE = 256
+
+# Bytes read at a time when hashing a file
+HASH_CHUNK = 1024 * 1024
+
+# Columns listed in the grid; thumbnails are fetched one by one when shown
+LIST_COLUMNS = ('path', 'width', 'height', 'aspect', 'hash')
+
+# How far an image's aspect ratio may be from the layout's to count as fitting
+ASPECT_TOLERANCE = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    aspect REAL NOT NULL,
+    hash TEXT NOT NULL,
+    thumbnail BLOB NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS images_folder ON images (folder);
+CREATE INDEX IF NOT EXISTS images_aspect ON images (aspect);
+"""
+
+def default_index_path():
+    """Per-user location of the library index"""
+    base = (
+        os.environ.get('LOCALAPPDATA')
+        or os.environ.get('XDG_CACHE_HOME')
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    )
+    return os.path.join(base, 'wallcrop', 'library.sqlite')
+
+def scan_folder(folder):
+    """Get {path: (mtime_ns, size)} for the images directly inside folder"""
+    stamps = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                stat = entry.stat()
+                stamps[os.path.abspath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+def content_hash(path):
+    """BLAKE2b digest of a file's bytes"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_thumbnail(image):
+    """Encode a JPEG thumbnail of an opened image, decoding as little as possible"""
+    # thumbnail() drafts JPEGs, so they decode straight to a DCT-scaled size
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+def build_entry(path, stamp):
+    """Read one image's metadata and thumbnail; runs on a worker thread"""
+    with Image.open(path) as image:
+        width, height = image.size
+        thumbnail = make_thumbnail(image)
+    mtime_ns, size = stamp
+    return {
+        'path': path,
+        'folder': os.path.dirname(path),
+        'mtime_ns': mtime_ns,
+        'size': size,
+        'width': width,
+        'height': height,
+        'aspect': width / height,
+        'hash': content_hash(path),
+        'thumbnail': thumbnail,
+    }
+
+def failed_entry(path, stamp):
+    """Entry recording that path could not be read as of stamp"""
+    mtime_ns, size = stamp
+    return {
+        'path': path,
+        'folder': os.path.dirname(path),
+        'mtime_ns': mtime_ns,
+        'size': size,
+        'width': 0,
+        'height': 0,
+        'aspect': 0.0,
+        'hash': '',
+        'thumbnail': b'',
+        'failed': True,
+    }
+
+def build_entries(items):
+    """Build entries for (path, stamp) pairs
+
+    Files that cannot be read get a failed entry, so they are not tried
+    again until they change.
+    """
+    entries = []
+    for path, stamp in items:
+        try:
+            entries.append({**build_entry(path, stamp), 'failed': False})
+        except Exception as e:
+            print(f"Skipping {path}: {str(e)}")
+            entries.append(failed_entry(path, stamp))
+    return entries
+
+def list_row(entry):
+    """The columns of a built entry that the grid lists, as entries() returns them"""
+    return {column: entry[column] for column in LIST_COLUMNS}
+
+def aspect_range(aspect_ratio, tolerance=ASPECT_TOLERANCE):
+    """(low, high) bounds of the aspect ratios that fit aspect_ratio"""
+    return aspect_ratio * (1 - tolerance), aspect_ratio * (1 + tolerance)
+
+class LibraryIndex:
+    """SQLite index of image metadata and thumbnails, refreshed by mtime and size
+
+    The index only ever runs queries; decoding thumbnails and hashing
+    files happens in build_entries() on worker threads, and the results
+    are stored from the thread that owns the index.
+    """
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+        # Indexes written before unreadable files were recorded
+        columns = {row['name'] for row in self.db.execute('PRAGMA table_info(images)')}
+        if 'failed' not in columns:
+            with self.db:
+                self.db.execute('ALTER TABLE images ADD COLUMN failed INTEGER NOT NULL DEFAULT 0')
+
+    def close(self):
+        self.db.close()
+
+    def entries(self, folder):
+        """Readable indexed images of a folder, sorted by name"""
+        return self.db.execute(
+            f'SELECT {", ".join(LIST_COLUMNS)} FROM images WHERE folder = ? AND NOT failed ORDER BY path',
+            (os.path.abspath(folder),)
+        ).fetchall()
+
+    def thumbnail(self, path):
+        """Encoded JPEG thumbnail of an indexed image, or None"""
+        row = self.db.execute('SELECT thumbnail FROM images WHERE path = ?', (path,)).fetchone()
+        return row['thumbnail'] if row else None
+
+    def stamps(self, folder):
+        """Get {path: (mtime_ns, size)} as of the last refresh of folder, failed files included"""
+        rows = self.db.execute(
+            'SELECT path, mtime_ns, size FROM images WHERE folder = ?',
+            (os.path.abspath(folder),)
+        )
+        return {row['path']: (row['mtime_ns'], row['size']) for row in rows}
+
+    def refresh_plan(self, folder, current):
+        """Compare a scan_folder() result with the index
+
+        Returns (path, stamp) pairs that need building, new or changed
+        since they were indexed, and the indexed paths that are gone.
+        """
+        indexed = self.stamps(folder)
+        stale = [(path, stamp) for path, stamp in sorted(current.items()) if indexed.get(path) != stamp]
+        removed = [path for path in indexed if path not in current]
+        return stale, removed
+
+    def store(self, entries):
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO images '
+                '(path, folder, mtime_ns, size, width, height, aspect, hash, thumbnail, failed) '
+                'VALUES (:path, :folder, :mtime_ns, :size, :width, :height, :aspect, :hash, :thumbnail, :failed)',
+                entries
+            )
+
+    def remove(self, paths):
+        with self.db:
+            self.db.executemany('DELETE FROM images WHERE path = ?', [(path,) for path in paths])
+
+    def matching_aspect(self, folder, aspect_ratio, tolerance=ASPECT_TOLERANCE):
+        """Readable indexed images of folder whose aspect ratio is within tolerance of aspect_ratio"""
+        return self.db.execute(
+            f'SELECT {", ".join(LIST_COLUMNS)} FROM images '
+            'WHERE folder = ? AND NOT failed AND aspect BETWEEN ? AND ? ORDER BY path',
+            (os.path.abspath(folder), *aspect_range(aspect_ratio, tolerance))
+        ).fetchall()
@@ -0,0 +1,249 @@
+import bisect
+import os
+from collections import OrderedDict
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QPixmap
+from PyQt6.QtWidgets import (
+    QCheckBox, QFileDialog, QHBoxLayout, QLabel, QListView, QPushButton, QVBoxLayout, QWidget
+)
+
+from library_index import LibraryIndex, aspect_range, build_entries, list_row, scan_folder
+from tasks import TaskExecutor
+
+# Images indexed per background task
+BUILD_CHUNK = 16
+
+# Decoded thumbnails kept in memory; the rest are read from the index when scrolled to
+MAX_PIXMAPS = 1000
+
+class LibraryModel(QAbstractListModel):
+    """Rows of a LibraryIndex listing with thumbnails loaded on demand"""
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.rows = []
+        self._pixmaps = OrderedDict()
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.endResetModel()
+
+    def update_rows(self, rows, dropped=()):
+        """Insert or replace rows and remove dropped paths, keeping rows sorted by path
+
+        Unlike set_rows() only the affected rows change, so views keep
+        their scroll position and selection.
+        """
+        for path in dropped:
+            position = self._find(path)
+            if position is not None:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self.rows[position]
+                self.endRemoveRows()
+
+        for row in rows:
+            position = self._find(row['path'])
+            if position is not None:
+                self.rows[position] = row
+                model_index = self.createIndex(position, 0)
+                self.dataChanged.emit(model_index, model_index)
+                continue
+            position = bisect.bisect_left(self.rows, row['path'], key=lambda listed: listed['path'])
+            self.beginInsertRows(QModelIndex(), position, position)
+            self.rows.insert(position, row)
+            self.endInsertRows()
+
+    def _find(self, path):
+        position = bisect.bisect_left(self.rows, path, key=lambda listed: listed['path'])
+        if position < len(self.rows) and self.rows[position]['path'] == path:
+            return position
+        return None
+
+    def forget(self, paths):
+        """Drop cached thumbnails of images that were indexed again"""
+        for path in paths:
+            self._pixmaps.pop(path, None)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, model_index, role=Qt.ItemDataRole.DisplayRole):
+        if not model_index.isValid():
+            return None
+        row = self.rows[model_index.row()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(row['path'])
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnail(row['path'])
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{row['path']}\n{row['width']}x{row['height']}"
+        if role == Qt.ItemDataRole.UserRole:
+            return row['path']
+        return None
+
+    def thumbnail(self, path):
+        pixmap = self._pixmaps.get(path)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(path)
+            return pixmap
+
+        pixmap = QPixmap()
+        data = self.index.thumbnail(path)
+        if data:
+            pixmap.loadFromData(data, 'JPEG')
+        self._pixmaps[path] = pixmap
+        if len(self._pixmaps) > MAX_PIXMAPS:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+class LibraryWindow(QWidget):
+    """Thumbnail grid of a wallpaper folder, backed by the persistent library index
+
+    Opening a folder shows what the index already has straight away, then
+    indexes new and changed files in the background and adds them to the
+    grid as they arrive. Double-clicking an image emits image_selected.
+    """
+    image_selected = pyqtSignal(str)
+
+    def __init__(self, aspect_ratio, index_path=None, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.aspect_ratio = aspect_ratio
+        self.index = LibraryIndex(index_path)
+        self.tasks = TaskExecutor(self, max_threads=os.cpu_count())
+        self.folder = None
+        self.building = {}
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle('Wallpaper Library')
+        self.resize(1000, 700)
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        open_button = QPushButton('Open Folder')
+        open_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        open_button.clicked.connect(self.choose_folder)
+        controls.addWidget(open_button)
+
+        # Only list images that the monitor layout's crop covers almost entirely
+        self.fits_check = QCheckBox('Fits my monitors')
+        self.fits_check.toggled.connect(self.show_rows)
+        controls.addWidget(self.fits_check)
+
+        self.status_label = QLabel()
+        controls.addWidget(self.status_label)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.model = LibraryModel(self.index, self)
+        self.grid = QListView()
+        self.grid.setViewMode(QListView.ViewMode.IconMode)
+        self.grid.setResizeMode(QListView.ResizeMode.Adjust)
+        self.grid.setMovement(QListView.Movement.Static)
+        self.grid.setUniformItemSizes(True)
+        self.grid.setLayoutMode(QListView.LayoutMode.Batched)
+        self.grid.setIconSize(QSize(160, 160))
+        self.grid.setGridSize(QSize(180, 200))
+        self.grid.setModel(self.model)
+        self.grid.activated.connect(self.select_image)
+        layout.addWidget(self.grid)
+
+    def set_aspect_ratio(self, aspect_ratio):
+        self.aspect_ratio = aspect_ratio
+        if self.fits_check.isChecked():
+            self.show_rows()
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Wallpaper Folder", self.folder or "")
+        if folder:
+            self.open_folder(folder)
+
+    def open_folder(self, folder):
+        """Show the indexed images of folder, then bring the index up to date"""
+        self.stop_indexing()
+        self.folder = os.path.abspath(folder)
+        self.setWindowTitle(f'Wallpaper Library - {self.folder}')
+        self.show_rows()
+        self.tasks.submit('scan', scan_folder, self.folder, on_done=self.refresh)
+
+    def refresh(self, current):
+        """Index new and changed files of a folder scan on the worker pool"""
+        stale, removed = self.index.refresh_plan(self.folder, current)
+        if removed:
+            self.index.remove(removed)
+            self.model.forget(removed)
+            self.model.update_rows([], removed)
+
+        for start in range(0, len(stale), BUILD_CHUNK):
+            chunk = stale[start:start + BUILD_CHUNK]
+            key = ('build', self.folder, start)
+            self.building[key] = len(chunk)
+            self.tasks.submit(
+                key,
+                build_entries,
+                chunk,
+                on_done=lambda entries, key=key: self.store_entries(key, entries)
+            )
+        self.update_status()
+
+    def stop_indexing(self):
+        for key in self.building:
+            self.tasks.cancel(key)
+        self.building.clear()
+
+    def store_entries(self, key, entries):
+        """Store a built chunk and add just its images to the grid"""
+        self.building.pop(key, None)
+        self.index.store(entries)
+        self.model.forget(entry['path'] for entry in entries)
+
+        low, high = aspect_range(self.aspect_ratio)
+        fits_only = self.fits_check.isChecked()
+        shown = []
+        dropped = []
+        for entry in entries:
+            if entry['failed'] or (fits_only and not low <= entry['aspect'] <= high):
+                dropped.append(entry['path'])
+            else:
+                shown.append(list_row(entry))
+        self.model.update_rows(shown, dropped)
+        self.update_status()
+
+    def show_rows(self):
+        """Reload the grid from the index, keeping the scroll position"""
+        if not self.folder:
+            return
+        if self.fits_check.isChecked():
+            rows = self.index.matching_aspect(self.folder, self.aspect_ratio)
+        else:
+            rows = self.index.entries(self.folder)
+
+        scroll_bar = self.grid.verticalScrollBar()
+        position = scroll_bar.value()
+        self.model.set_rows(rows)
+        scroll_bar.setValue(position)
+        self.update_status()
+
+    def update_status(self):
+        status = f"{len(self.model.rows)} images"
+        remaining = sum(self.building.values())
+        if remaining:
+            status += f", indexing {remaining} more..."
+        self.status_label.setText(status)
+
+    def select_image(self, model_index):
+        path = self.model.data(model_index, Qt.ItemDataRole.UserRole)
+        if path:
+            self.image_selected.emit(path)
+
+    def closeEvent(self, event):
+        """Stop indexing when the library is closed; it resumes on the next open"""
+        self.stop_indexing()
+        super().closeEvent(event)
+
+    def shutdown(self):
+        self.tasks.shutdown()
+        self.index.close()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from export import image_format, make_temp, publish
+
+def find_jpegtran():
+    """Path of the jpegtran tool from WALLCROP_JPEGTRAN or PATH, or None"""
+    return os.environ.get('WALLCROP_JPEGTRAN') or shutil.which('jpegtran')
+
+def mcu_size(image):
+    """Width and height in pixels of a JPEG's minimum coded unit"""
+    if image.mode == 'L' or not getattr(image, 'layer', None):
+        return 8, 8
+    return (
+        8 * max(h for _, h, _, _ in image.layer),
+        8 * max(v for _, _, v, _ in image.layer)
+    )
+
+def snap_edges(boxes, mcu):
+    """Move boxes up and left onto the MCU grid, keeping shared edges shared
+
+    Every coordinate a box starts at is snapped down to the grid once,
+    so a box ending where its neighbour starts still ends there and
+    monitor slices neither overlap nor leave a gap. Edges no box starts
+    at (the far side of the crop) move with the crop's own corner, which
+    keeps the crop's overall size. Returns None if a box would vanish.
+    """
+    starts = ({x1 for x1, _, _, _ in boxes}, {y1 for _, y1, _, _ in boxes})
+    offset = (
+        min(x1 for x1, _, _, _ in boxes) % mcu[0],
+        min(y1 for _, y1, _, _ in boxes) % mcu[1]
+    )
+
+    def snap(value, axis):
+        if value in starts[axis]:
+            return value - value % mcu[axis]
+        return value - offset[axis]
+
+    snapped = [(snap(x1, 0), snap(y1, 1), snap(x2, 0), snap(y2, 1)) for x1, y1, x2, y2 in boxes]
+    if any(x2 <= x1 or y2 <= y1 for x1, y1, x2, y2 in snapped):
+        return None
+    return snapped
+
+def lossless_jobs(path, jobs, snap=True):
+    """Get (box, path) jobs that can be cut from a JPEG without re-encoding
+
+    jpegtran can only start a crop on an MCU boundary (8 or 16 pixels).
+    With snap, boxes move up and left by less than one MCU to get
+    there, see snap_edges(); otherwise unaligned boxes make the whole
+    export ineligible. Returns None if the source or any output is not
+    a JPEG.
+    """
+    with Image.open(path) as image:
+        if image.format != 'JPEG':
+            return None
+        mcu = mcu_size(image)
+
+    if any(image_format(output_path) != 'JPEG' for _, output_path in jobs):
+        return None
+    boxes = [tuple(box) for box, _ in jobs]
+    aligned = snap_edges(boxes, mcu)
+    if aligned is None or (aligned != boxes and not snap):
+        return None
+    return [(box, output_path) for box, (_, output_path) in zip(aligned, jobs)]
+
+def _crop_to_temp(jpegtran, source, box, path):
+    x1, y1, x2, y2 = box
+    fd, temp_path = make_temp(path)
+    os.close(fd)
+    try:
+        subprocess.run(
+            [jpegtran, '-copy', 'all', '-perfect',
+             '-crop', f'{x2 - x1}x{y2 - y1}+{x1}+{y1}',
+             '-outfile', temp_path, source],
+            check=True,
+            capture_output=True
+        )
+    except Exception as e:
+        os.unlink(temp_path)
+        return None, e
+    return temp_path, None
+
+def export_lossless(path, jobs, snap=True, max_workers=None):
+    """Cut (box, path) jobs out of a JPEG in the DCT domain with jpegtran
+
+    The slices keep the source's exact coefficients, so there is no
+    generation loss and no decode or encode. Returns the output paths,
+    or None if lossless cropping is not possible here and the caller
+    should export normally.
+    """
+    jpegtran = find_jpegtran()
+    if not jpegtran:
+        return None
+    jobs = lossless_jobs(path, jobs, snap)
+    if jobs is None:
+        return None
+
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+    if max_workers <= 1:
+        results = [_crop_to_temp(jpegtran, path, box, output_path) for box, output_path in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wallcrop-jpegtran') as pool:
+            futures = [pool.submit(_crop_to_temp, jpegtran, path, box, output_path) for box, output_path in jobs]
+            results = [future.result() for future in futures]
+
+    try:
+        return publish(results, jobs)
+    except subprocess.CalledProcessError as e:
+        print(f"Lossless crop failed, re-encoding instead: {e.stderr.decode(errors='replace').strip()}")
+    except OSError as e:
+        print(f"Lossless crop failed, re-encoding instead: {str(e)}")
+    return None
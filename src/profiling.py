@@ -0,0 +1,233 @@
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# WALLCROP_PROFILE=1 times the hot paths and shows the stage overlay; any
+# other value is also the file the Chrome trace is written to on exit
+PROFILE_ENV = 'WALLCROP_PROFILE'
+
+# Upper edges of the latency histogram buckets in milliseconds; the last
+# bucket takes everything slower
+BUCKET_EDGES_MS = (0.5, 1, 2, 4, 8, 16, 33, 66, 125, 250, 500, 1000, 2000, 4000)
+
+# Recent samples per stage kept for percentiles
+RECENT_SAMPLES = 1000
+
+# Trace events kept in memory; the oldest are dropped beyond this
+MAX_TRACE_EVENTS = 200_000
+
+_NULL_STAGE = nullcontext()
+
+def peak_memory():
+    """Peak resident memory of this process in bytes, or None if unknown"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        return _windows_peak_memory()
+    return None
+
+def _windows_peak_memory():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+class StageStats:
+    """Latency histogram of one stage, plus how much it raised the memory peak"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_EDGES_MS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.last = 0.0
+        self.peak_growth = 0
+
+    def add(self, seconds, peak_growth):
+        milliseconds = seconds * 1000
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+        self.last = milliseconds
+        self.recent.append(milliseconds)
+        self.peak_growth = max(self.peak_growth, peak_growth)
+        for index, edge in enumerate(BUCKET_EDGES_MS):
+            if milliseconds <= edge:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max,
+            'peak_growth_bytes': self.peak_growth,
+            'histogram_ms': {
+                f"<={edge}": count for edge, count in zip(BUCKET_EDGES_MS, self.buckets)
+            } | {f">{BUCKET_EDGES_MS[-1]}": self.buckets[-1]},
+        }
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'args', 'start', 'peak')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.peak = peak_memory()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        peak = peak_memory()
+        growth = peak - self.peak if peak is not None and self.peak is not None else 0
+        self.profiler.record(self.name, self.start, duration, growth, self.args)
+        return False
+
+class Profiler:
+    """Per-stage timings of the hot paths, cheap enough to leave in place
+
+    Disabled, stage() returns a shared no-op context manager. Enabled,
+    every stage records its latency into a histogram and a Chrome trace
+    event (chrome://tracing, Perfetto) with the thread it ran on. Stages
+    may run on any thread.
+    """
+    def __init__(self, enabled=False, trace_path=None):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.stages = {}
+        self.errors = 0
+        self._events = deque(maxlen=MAX_TRACE_EVENTS)
+        self._threads = {}
+        self._epoch = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        value = os.environ.get(PROFILE_ENV, '').strip()
+        if not value or value == '0':
+            return cls()
+        return cls(True, None if value == '1' else value)
+
+    def stage(self, name, **args):
+        """Time a with block as stage name; args are shown on its trace event"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, args)
+
+    def record(self, name, start, duration, peak_growth=0, args=None):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - self._epoch) * 1_000_000,
+            'dur': duration * 1_000_000,
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.add(duration, peak_growth)
+            self._threads[thread.ident] = thread.name
+            self._events.append(event)
+
+    def error(self, message):
+        """Report the exception being handled, with its traceback"""
+        print(message)
+        traceback.print_exc()
+        if self.enabled:
+            with self._lock:
+                self.errors += 1
+                self._events.append({
+                    'name': message,
+                    'ph': 'i',
+                    's': 'p',
+                    'ts': (time.perf_counter() - self._epoch) * 1_000_000,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                })
+
+    def summary(self):
+        """Stage statistics and the process's peak memory, ready for json.dump"""
+        with self._lock:
+            stages = {name: stats.summary() for name, stats in sorted(self.stages.items())}
+            errors = self.errors
+        return {'stages': stages, 'errors': errors, 'peak_memory_bytes': peak_memory()}
+
+    def write_trace(self, path):
+        """Write a Chrome trace file with the summary stored under otherData"""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        events.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        )
+        data = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': self.summary(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def finish(self):
+        """Print the stage summary and write the trace, if profiling is on"""
+        if not self.enabled:
+            return
+        for name, stats in self.summary()['stages'].items():
+            print(f"{name:10} n={stats['count']:6}  mean {stats['mean_ms']:8.2f} ms  "
+                  f"p95 {stats['p95_ms']:8.2f} ms  max {stats['max_ms']:8.2f} ms")
+        if self.trace_path:
+            self.write_trace(self.trace_path)
+            print(f"Profile written to {self.trace_path}")
+
+profiler = Profiler.from_environment()
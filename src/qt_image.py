@@ -0,0 +1,99 @@
+import sys
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPixmap
+
+from profiling import profiler
+
+# Pillow mode -> (raw mode passed to tobytes, QImage format, bytes per pixel).
+# Every entry is a layout Qt can display and scale without converting it first.
+QT_LAYOUTS = {
+    'RGB': ('BGRX' if sys.byteorder == 'little' else 'XRGB', QImage.Format.Format_RGB32, 4),
+    'RGBX': ('RGBX', QImage.Format.Format_RGBX8888, 4),
+    'RGBA': ('RGBA', QImage.Format.Format_RGBA8888, 4),
+    'L': ('L', QImage.Format.Format_Grayscale8, 1),
+    'I;16': ('I;16', QImage.Format.Format_Grayscale16, 2),
+}
+
+# Rows copied per step; bounds the temporary memory used during conversion
+BAND_HEIGHT = 64
+
+def qt_compatible_mode(pil_image):
+    """Get the mode an image has to be converted to before Qt can show it"""
+    mode = pil_image.mode
+    if mode in QT_LAYOUTS:
+        return mode
+    if mode in ('LA', 'PA', 'RGBa', 'La'):
+        return 'RGBA'
+    if mode == 'P':
+        return 'RGBA' if 'transparency' in pil_image.info else 'RGB'
+    if mode == '1':
+        return 'L'
+    return 'RGB'
+
+def pil_to_qimage(pil_image):
+    """Copy a PIL image into a QImage with a single full-size buffer
+
+    Pillow keeps its pixels in separately allocated row blocks, so they
+    cannot be handed to Qt as one buffer. Instead the QImage allocates its
+    own storage and is filled band by band; modes Qt cannot show are
+    converted per band, so no full-size intermediate copy is ever made.
+    """
+    with profiler.stage('convert', mode=pil_image.mode):
+        return _copy_to_qimage(pil_image)
+
+def _copy_to_qimage(pil_image):
+    mode = qt_compatible_mode(pil_image)
+    raw_mode, image_format, bytes_per_pixel = QT_LAYOUTS[mode]
+    width, height = pil_image.size
+
+    qimage = QImage(width, height, image_format)
+    if qimage.isNull():
+        raise ValueError("Failed to create QImage")
+
+    stride = qimage.bytesPerLine()
+    row_bytes = width * bytes_per_pixel
+    bits = qimage.bits()
+    bits.setsize(qimage.sizeInBytes())
+    target = memoryview(bits)
+
+    for top in range(0, height, BAND_HEIGHT):
+        bottom = min(height, top + BAND_HEIGHT)
+        band = pil_image.crop((0, top, width, bottom))
+        if band.mode != mode:
+            band = band.convert(mode)
+        data = band.tobytes('raw', raw_mode)
+
+        if stride == row_bytes:
+            target[top * stride:bottom * stride] = data
+        else:
+            # Qt pads scanlines to 32 bits, copy row by row
+            for row in range(bottom - top):
+                start = (top + row) * stride
+                target[start:start + row_bytes] = data[row * row_bytes:(row + 1) * row_bytes]
+
+    return qimage
+
+def pil_to_scaled_qimage(pil_image, width, height, transformation_mode=None):
+    """Convert a PIL image to a QImage of the given size; safe off the GUI thread"""
+    qimage = pil_to_qimage(pil_image)
+    if (width, height) != (qimage.width(), qimage.height()):
+        with profiler.stage('scale'):
+            qimage = qimage.scaled(
+                width,
+                height,
+                Qt.AspectRatioMode.IgnoreAspectRatio,
+                transformation_mode or Qt.TransformationMode.FastTransformation
+            )
+    return qimage
+
+def pil_to_scaled_pixmap(pil_image, width, height, transformation_mode=None):
+    """Convert a PIL image straight to a QPixmap of the given size
+
+    Scaling happens on the QImage, so no full-resolution QPixmap is ever
+    allocated.
+    """
+    pixmap = QPixmap.fromImage(pil_to_scaled_qimage(pil_image, width, height, transformation_mode))
+    if pixmap.isNull():
+        raise ValueError("Failed to create QPixmap")
+    return pixmap
@@ -0,0 +1,212 @@
+import mmap
+
+from PIL import Image
+
+# Panoramas and raw scans routinely exceed Pillow's decompression-bomb
+# limit (~179 MP) and large ones are read by region anyway. The check
+# stays on above this: Pillow warns past it and refuses twice as much,
+# so a crafted file in a scanned folder cannot ask for unbounded memory.
+MAX_SOURCE_PIXELS = 4_000_000_000
+Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+
+# How a file can be decoded partially, see region_access()
+ACCESS_TILES = 'tiles'
+ACCESS_RAW = 'raw'
+ACCESS_ROWS = 'rows'
+ACCESS_FULL = 'full'
+
+def _replace_tile(tile, extents, offset, args):
+    # Pillow >= 11 uses a namedtuple for tiles, older versions plain tuples
+    if hasattr(tile, '_replace'):
+        return tile._replace(extents=extents, offset=offset, args=args)
+    return (tile[0], extents, offset, args)
+
+def _raw_args(tile):
+    """Normalize raw decoder args to (rawmode, stride, orientation)"""
+    args = tile[3]
+    if isinstance(args, str):
+        args = (args,)
+    rawmode = args[0]
+    stride = args[1] if len(args) > 1 else 0
+    orientation = args[2] if len(args) > 2 else 1
+    return rawmode, stride, orientation
+
+def _raw_bytes_per_pixel(mode, rawmode):
+    try:
+        size = len(Image.new(mode, (1, 1)).tobytes('raw', rawmode))
+    except Exception:
+        return None
+    # Bit-packed rows cannot be entered at an arbitrary pixel
+    return size if mode != '1' else None
+
+def _mapped_tiles(image):
+    """Where every tile of an opened image lies in its file, for _read_mapped()
+
+    Returns (extents, offset, rawmode, stride, orientation, bytes per
+    pixel) per tile, or None unless all of them are raw and can be entered
+    at any pixel. Planar TIFFs store one tile per band at the same
+    extents and are left to Pillow.
+    """
+    tiles = []
+    seen = set()
+    for tile in image.tile:
+        extents = tuple(tile[1])
+        if tile[0] != 'raw' or extents in seen:
+            return None
+        seen.add(extents)
+        rawmode, stride, orientation = _raw_args(tile)
+        bytes_per_pixel = _raw_bytes_per_pixel(image.mode, rawmode)
+        if not bytes_per_pixel or abs(orientation) != 1:
+            return None
+        stride = stride or (extents[2] - extents[0]) * bytes_per_pixel
+        tiles.append((extents, tile[2], rawmode, stride, orientation, bytes_per_pixel))
+    return tiles
+
+def _read_mapped(path, image, tiles, box):
+    """Decode box straight from a read-only memory map of the file
+
+    Only the pages holding the region's pixels are touched, and they come
+    from the OS page cache, which every process reading the file shares.
+    The map is dropped on return, so the pages count towards this
+    process's memory only while the region is being read.
+    """
+    x1, y1, x2, y2 = box
+    parts = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for (tx1, ty1, tx2, ty2), offset, rawmode, stride, orientation, bytes_per_pixel in tiles:
+            left, top = max(x1, tx1), max(y1, ty1)
+            right, bottom = min(x2, tx2), min(y2, ty2)
+            if left >= right or top >= bottom:
+                continue
+
+            # The first row in file order is the last one of bottom-up files;
+            # the raw decoder then steps through the rows at stride
+            first_row = top - ty1 if orientation > 0 else ty2 - bottom
+            start = offset + first_row * stride + (left - tx1) * bytes_per_pixel
+            end = start + (bottom - top - 1) * stride + (right - left) * bytes_per_pixel
+            if start < 0 or end > len(mapped):
+                raise OSError("image file is truncated")
+            with memoryview(mapped) as view, view[start:end] as data:
+                part = Image.frombytes(
+                    image.mode, (right - left, bottom - top), data, 'raw', rawmode, stride, orientation
+                )
+            parts.append((part, (left - x1, top - y1)))
+
+    if len(parts) == 1 and parts[0][0].size == (x2 - x1, y2 - y1):
+        region = parts[0][0]
+    else:
+        region = Image.new(image.mode, (x2 - x1, y2 - y1))
+        for part, position in parts:
+            region.paste(part, position)
+    if image.mode in ('P', 'PA') and image.palette is not None:
+        region.putpalette(image.palette.palette, image.palette.mode)
+    region.info = dict(image.info)
+    return region
+
+def region_access(image):
+    """Work out how much of an opened (not yet loaded) image a region read decodes
+
+    ACCESS_TILES and ACCESS_RAW decode only what covers the region,
+    ACCESS_ROWS decodes every row down to the region's bottom edge and
+    ACCESS_FULL has to decode the whole image.
+    """
+    tiles = image.tile
+    if not tiles:
+        return ACCESS_FULL
+    if len(tiles) > 1:
+        return ACCESS_TILES
+
+    tile = tiles[0]
+    full_extents = (0, 0) + image.size
+    if tuple(tile[1]) != full_extents:
+        return ACCESS_FULL
+    if tile[0] == 'raw':
+        rawmode, _, orientation = _raw_args(tile)
+        if abs(orientation) == 1 and _raw_bytes_per_pixel(image.mode, rawmode):
+            return ACCESS_RAW
+    if tile[0] == 'zip' and image.format == 'PNG' and not image.info.get('interlace'):
+        return ACCESS_ROWS
+    return ACCESS_FULL
+
+def read_region(path, box):
+    """Decode only the part of an image file that covers box
+
+    Returns an image of exactly box's size. Peak memory is bounded by the
+    region for raw (BMP/PPM/uncompressed TIFF) and multi-tile TIFF files,
+    by the rows above the region's bottom for non-interlaced PNG, and by
+    the whole image for everything else (JPEG and compressed TIFF cannot
+    stop or seek mid-stream in Pillow). Raw files are read through a
+    memory map, see _read_mapped().
+    """
+    image = Image.open(path)
+    x1, y1, x2, y2 = box
+    access = region_access(image)
+
+    if access in (ACCESS_RAW, ACCESS_TILES):
+        tiles = _mapped_tiles(image)
+        if tiles is not None:
+            try:
+                region = _read_mapped(path, image, tiles, box)
+            except (OSError, ValueError):
+                # Files that cannot be mapped are read below instead
+                pass
+            else:
+                image.close()
+                return region
+
+    if access == ACCESS_TILES:
+        selected = [
+            tile for tile in image.tile
+            if tile[1][0] < x2 and tile[1][2] > x1 and tile[1][1] < y2 and tile[1][3] > y1
+        ]
+        left = min(tile[1][0] for tile in selected)
+        top = min(tile[1][1] for tile in selected)
+        right = max(tile[1][2] for tile in selected)
+        bottom = max(tile[1][3] for tile in selected)
+        image.tile = [
+            _replace_tile(
+                tile,
+                (tile[1][0] - left, tile[1][1] - top, tile[1][2] - left, tile[1][3] - top),
+                tile[2],
+                tile[3]
+            )
+            for tile in selected
+        ]
+        image._size = (right - left, bottom - top)
+        image.load()
+        return image.crop((x1 - left, y1 - top, x2 - left, y2 - top))
+
+    if access == ACCESS_RAW:
+        tile = image.tile[0]
+        width, height = image.size
+        rawmode, stride, orientation = _raw_args(tile)
+        bytes_per_pixel = _raw_bytes_per_pixel(image.mode, rawmode)
+        stride = stride or width * bytes_per_pixel
+
+        # Start at the first needed row (the last one for bottom-up files)
+        # and column; the raw decoder then reads region-width rows at stride
+        first_row = y1 if orientation > 0 else height - y2
+        offset = tile[2] + first_row * stride + x1 * bytes_per_pixel
+        image.tile = [_replace_tile(tile, (0, 0, x2 - x1, y2 - y1), offset, (rawmode, stride, orientation))]
+        image._size = (x2 - x1, y2 - y1)
+        image.load()
+        return image
+
+    if access == ACCESS_ROWS:
+        tile = image.tile[0]
+        width = image.size[0]
+        image.tile = [_replace_tile(tile, (0, 0, width, y2), tile[2], tile[3])]
+        image._size = (width, y2)
+        image.load()
+        return image.crop(box)
+
+    image.load()
+    return image.crop(box)
+
+def iter_bands(path, band_height):
+    """Yield (top, band) strips of a random-access image without a full decode"""
+    with Image.open(path) as image:
+        width, height = image.size
+    for top in range(0, height, band_height):
+        bottom = min(height, top + band_height)
+        yield top, read_region(path, (0, top, width, bottom))
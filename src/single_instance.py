@@ -0,0 +1,116 @@
+import getpass
+import json
+import os
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+# How long a second launch waits for the running window before starting its own
+CONNECT_TIMEOUT_MS = 500
+
+# Largest message accepted from a client; a long list of paths is well below this
+MAX_MESSAGE_BYTES = 1 << 20
+
+def server_name():
+    """Local socket name, one per user so different users get their own window"""
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        return 'wallcrop'
+    return f"wallcrop-{user}"
+
+def send_to_running(paths, name=None, timeout=CONNECT_TIMEOUT_MS):
+    """Hand paths to the running instance; returns False if there is none
+
+    Paths are made absolute first, since the running instance has its own
+    working directory.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(name or server_name())
+    if not socket.waitForConnected(timeout):
+        return False
+
+    message = json.dumps({'paths': [os.path.abspath(path) for path in paths]})
+    socket.write(message.encode('utf-8') + b'\n')
+    if not socket.waitForBytesWritten(timeout):
+        socket.abort()
+        return False
+    socket.disconnectFromServer()
+    if socket.state() != QLocalSocket.LocalSocketState.UnconnectedState:
+        socket.waitForDisconnected(timeout)
+    return True
+
+class InstanceServer(QObject):
+    """Listen for paths sent by later launches, see send_to_running()
+
+    Every client sends one JSON line, {"paths": [...]}, and disconnects.
+    paths_received is emitted with the list, which may be empty, on the
+    GUI thread. The socket only accepts connections from the same user.
+    """
+    paths_received = pyqtSignal(list)
+
+    def __init__(self, name=None, parent=None):
+        super().__init__(parent)
+        self.name = name or server_name()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self._accept)
+        self._buffers = {}
+
+    def listen(self):
+        """Start listening; returns False if another instance already is
+
+        Asks first: with access options set, Qt replaces an existing socket
+        instead of failing, which would take the name from a live instance.
+        A socket left behind by a crashed instance is removed.
+        """
+        probe = QLocalSocket()
+        probe.connectToServer(self.name)
+        if probe.waitForConnected(CONNECT_TIMEOUT_MS):
+            probe.abort()
+            return False
+        if self.server.listen(self.name):
+            return True
+        if self.server.serverError() != QAbstractSocket.SocketError.AddressInUseError:
+            return False
+        QLocalServer.removeServer(self.name)
+        return self.server.listen(self.name)
+
+    def close(self):
+        self.server.close()
+
+    def _accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self._buffers[socket] = bytearray()
+            socket.readyRead.connect(lambda socket=socket: self._read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._finish(socket))
+            # The client may have written and left before the signals were connected
+            self._read(socket)
+
+    def _read(self, socket):
+        buffer = self._buffers.get(socket)
+        if buffer is None:
+            return
+        buffer += bytes(socket.readAll())
+        if b'\n' in buffer or len(buffer) > MAX_MESSAGE_BYTES:
+            self._finish(socket)
+
+    def _finish(self, socket):
+        buffer = self._buffers.pop(socket, None)
+        if buffer is None:
+            return
+        buffer += bytes(socket.readAll())
+        socket.disconnectFromServer()
+        socket.deleteLater()
+
+        # Another launch checking whether this instance is alive
+        if not buffer.strip():
+            return
+        try:
+            message = json.loads(bytes(buffer).split(b'\n', 1)[0])
+            paths = [path for path in message['paths'] if isinstance(path, str)]
+        except (ValueError, KeyError, TypeError):
+            print("Ignoring a malformed message from another instance")
+            return
+        self.paths_received.emit(paths)
@@ -0,0 +1,124 @@
+import traceback
+
+from PyQt6.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+
+class Task(QRunnable):
+    """One unit of work submitted to a TaskExecutor"""
+    def __init__(self, executor, key, generation, fn, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.executor = executor
+        self.key = key
+        self.generation = generation
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled or not self.executor.is_current(self):
+            self._post(None, None)
+            return
+
+        result = error = None
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            error = (e, traceback.format_exc())
+        self._post(result, error)
+
+    def _post(self, result, error):
+        try:
+            self.executor._task_done.emit(self, result, error)
+        except RuntimeError:
+            # The executor was destroyed while this task was running
+            pass
+
+class TaskExecutor(QObject):
+    """Run blocking work on a QThreadPool and deliver results on the GUI thread
+
+    Tasks are grouped by key. Submitting a new task under a key supersedes
+    the previous one: it is pulled from the queue if it has not started,
+    and its result is dropped if it has. Callbacks always run on the thread
+    that owns the executor.
+    """
+    _task_done = pyqtSignal(object, object, object)
+
+    def __init__(self, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self._generations = {}
+        self._pending = {}
+        self._callbacks = {}
+        self._task_done.connect(self._deliver)
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, **kwargs):
+        """Queue fn(*args, **kwargs), superseding any earlier task with the same key"""
+        self.cancel(key)
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+
+        task = Task(self, key, generation, fn, args, kwargs)
+        self._pending[task] = True
+        self._callbacks[task] = (on_done, on_error)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, key):
+        """Cancel the latest task for key, dropping its result if already running"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        for task in list(self._pending):
+            if task.key == key:
+                task.cancelled = True
+                if self.pool.tryTake(task):
+                    self._forget(task)
+
+    def is_current(self, task):
+        return not task.cancelled and self._generations.get(task.key) == task.generation
+
+    def is_busy(self, key):
+        return any(task.key == key and not task.cancelled for task in self._pending)
+
+    def busy_keys(self):
+        return {task.key for task in self._pending if not task.cancelled}
+
+    def shutdown(self, msecs=-1, finish=None):
+        """Cancel queued tasks and wait for running ones to finish
+
+        Tasks whose key finish(key) accepts, such as exports, are not
+        cancelled but run to completion, and their callbacks are still
+        called before this returns.
+        """
+        kept = [task for task in self._pending if finish is not None and finish(task.key)]
+        kept_keys = {task.key for task in kept}
+        for key in list(self._generations):
+            if key not in kept_keys:
+                self.cancel(key)
+        if not kept:
+            self.pool.clear()
+        self.pool.waitForDone(msecs)
+        if kept:
+            # Results are queued to this thread; deliver them before it stops
+            QCoreApplication.sendPostedEvents()
+
+    def _deliver(self, task, result, error):
+        on_done, on_error = self._callbacks.get(task, (None, None))
+        current = self.is_current(task)
+        self._forget(task)
+        if not current:
+            return
+
+        if error is not None:
+            if on_error:
+                on_error(error[0])
+            else:
+                print(f"Error in background task '{task.key}': {str(error[0])}")
+                print(error[1])
+        elif on_done:
+            on_done(result)
+
+    def _forget(self, task):
+        self._pending.pop(task, None)
+        self._callbacks.pop(task, None)
@@ -1,83 +1,290 @@
+import argparse
 import os
 import sys
-from PIL import Image
+import time
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QFileDialog, QSizePolicy, QGroupBox
+    QPushButton, QLabel, QFileDialog, QGroupBox, QComboBox, QCheckBox
 )
-from PyQt6.QtCore import Qt, QRect, QPoint, QTimer
-from PyQt6.QtGui import QPixmap, QPainter, QPen, QColor, QImage
+from PyQt6.QtCore import Qt, QRect, QRectF, QPoint, QSettings, QSize, QTimer
+from PyQt6.QtGui import QPixmap
+from crop_canvas import CropCanvas
+from encoder_presets import DEFAULT_PRESET, PRESETS
+from formats import open_filter
+from frame_scheduler import FrameScheduler, REGION_IMAGE, REGION_OVERLAY, REGION_PREVIEWS
+from image_cache import ImageCache
+from layout import MonitorLayout
+from profiling import peak_memory, profiler
+from qt_image import pil_to_qimage, pil_to_scaled_pixmap, pil_to_scaled_qimage
+from tasks import TaskExecutor
+
+# Pillow, NumPy and the modules built on them are imported where they are
+# first used, so the window paints before any of them has loaded
+
+# Images prefetched on each side of the current one in its folder
+PREFETCH_DISTANCE = 1
+
+# How often the profiling overlay is refreshed
+STATS_INTERVAL_MS = 500
+
+# Stages listed on the profiling overlay, in pipeline order
+OVERLAY_STAGES = ('decode', 'convert', 'scale', 'frame', 'paint', 'preview', 'crop', 'encode', 'write')
+
+# QSettings organization and application the window state is kept under
+SETTINGS_SCOPE = ('wallcrop', 'wallcrop')
+
+# Modern dark theme for the whole window, parsed once
+STYLESHEET = """
+    QMainWindow {
+        background-color: #1a1a1a;
+    }
+    QPushButton {
+        background-color: #2d89ef;
+        color: white;
+        border: none;
+        padding: 12px 24px;
+        border-radius: 6px;
+        font-weight: bold;
+        font-size: 14px;
+    }
+    QPushButton:hover {
+        background-color: #3999ff;
+    }
+    QPushButton:pressed {
+        background-color: #2076d8;
+    }
+    QPushButton#exitButton {
+        background-color: #dc3545;  /* Red color for exit */
+    }
+    QPushButton#exitButton:hover {
+        background-color: #e04755;
+    }
+    QPushButton#exitButton:pressed {
+        background-color: #c82333;
+    }
+    QLabel {
+        color: white;
+        font-size: 14px;
+    }
+    QComboBox {
+        background-color: #2d2d2d;
+        color: white;
+        border: 2px solid #333333;
+        border-radius: 6px;
+        padding: 10px 12px;
+        font-size: 14px;
+    }
+    QCheckBox {
+        color: white;
+        font-size: 14px;
+    }
+    QGroupBox {
+        color: #ffffff;
+        border: 2px solid #333333;
+        border-radius: 10px;
+        margin-top: 1.5em;
+        padding: 15px;
+        background-color: #242424;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        padding: 0 15px;
+        color: #2d89ef;
+        font-weight: bold;
+        font-size: 14px;
+    }
+    QWidget#previewFrame {
+        background-color: #242424;
+        border-radius: 8px;
+        padding: 10px;
+    }
+    QLabel#preview {
+        background-color: #1a1a1a;
+        border: none;
+    }
+"""
+
+class ViewGeometry:
+    """Displayed image rect and display-to-source transform for one label size"""
+    def __init__(self, image_size, view_size):
+        img_width, img_height = image_size
+        view_width, view_height = view_size
+        fitted = QSize(img_width, img_height).scaled(
+            view_width, view_height, Qt.AspectRatioMode.KeepAspectRatio
+        )
+        width, height = fitted.width(), fitted.height()
+
+        self.image_size = (img_width, img_height)
+        self.view_size = (view_width, view_height)
+        self.display_rect = QRect(
+            (view_width - width) // 2,
+            (view_height - height) // 2,
+            width,
+            height
+        )
+        self.scale_x = img_width / width if width else 0.0
+        self.scale_y = img_height / height if height else 0.0
+
+    def is_valid(self):
+        return not self.display_rect.isEmpty()
+
+    def to_source_box(self, rect):
+        """Map a display rect to a clamped float (x1, y1, x2, y2) box in source pixels
+
+        The box spans from the rect's left edge to its right edge, so a
+        rect covering the whole display maps to the whole source.
+        """
+        img_width, img_height = self.image_size
+        x1 = max(0.0, (rect.x() - self.display_rect.x()) * self.scale_x)
+        y1 = max(0.0, (rect.y() - self.display_rect.y()) * self.scale_y)
+        x2 = min(img_width, (rect.x() + rect.width() - self.display_rect.x()) * self.scale_x)
+        y2 = min(img_height, (rect.y() + rect.height() - self.display_rect.y()) * self.scale_y)
+        return x1, y1, x2, y2
+
+    def to_display_rect(self, box):
+        """Map an (x1, y1, x2, y2) box in source pixels to the nearest display rect"""
+        x1, y1, x2, y2 = box
+        left = self.display_rect.x() + round(x1 / self.scale_x)
+        top = self.display_rect.y() + round(y1 / self.scale_y)
+        right = self.display_rect.x() + round(x2 / self.scale_x)
+        bottom = self.display_rect.y() + round(y2 / self.scale_y)
+        return QRect(left, top, right - left, bottom - top)
+
+def load_entry(path, screen_size, view_size=None, start_full=True, auto_layout=None):
+    """Decode path and build its display pyramid, off the GUI thread
+
+    With a view_size the scaled display image for that view is prepared
+    as well, so showing the entry only has to upload it. With an
+    auto_layout the crop is placed by auto_crop_box() for that layout.
+    """
+    import image_loader
+    from image_cache import CacheEntry, file_key
+    from image_pyramid import ImagePyramid
+
+    key = file_key(path)
+    loaded_image = image_loader.load_image(path, screen_size, start_full)
+    pyramid = ImagePyramid(loaded_image.preview, screen_size, source_size=loaded_image.size)
+    entry = CacheEntry(key, loaded_image, pyramid)
+    if auto_layout is not None:
+        entry.crop_box = auto_crop_of(pyramid, auto_layout)
+
+    if view_size:
+        display_rect = ViewGeometry(loaded_image.size, view_size).display_rect
+        width, height = display_rect.width(), display_rect.height()
+        if width > 0 and height > 0:
+            entry.display_image = pil_to_scaled_qimage(pyramid.level_for(width, height), width, height)
+            entry.display_view_size = view_size
+    return entry
+
+def auto_crop_of(pyramid, layout):
+    """Content-aware crop box of a pyramid's source, scored on a small level"""
+    from auto_crop import SCORE_SIZE, auto_crop_box
+    from crop_plan import DEFAULT_FILL
+
+    small = pyramid.level_for(SCORE_SIZE, SCORE_SIZE)
+    return auto_crop_box(small, layout, DEFAULT_FILL, image_size=pyramid.source_size)
+
+def render_previews(pyramid, jobs):
+    """Render (box, size) preview jobs from the pyramid, off the GUI thread
+
+    Returns the images and the time the render took.
+    """
+    start = time.perf_counter()
+    with profiler.stage('preview', count=len(jobs)):
+        images = [pil_to_qimage(pyramid.region(box, size)) for box, size in jobs]
+    return images, time.perf_counter() - start
+
+def export_wallpapers(loaded_image, jobs, preset=None, lossless=False, sizes=None):
+    """Crop and save (box, path) jobs from the full-resolution image
+
+    Boxes are float source boxes; with sizes every slice is resampled
+    to its size in one pass, see export.crop_slice().
+    """
+    from export import export_region, export_slices
+    from lossless_jpeg import export_lossless
+
+    # JPEG to JPEG can be cut without decoding or re-encoding at all, at source resolution
+    if lossless:
+        pixel_jobs = [(tuple(round(v) for v in box), path) for box, path in jobs]
+        paths = export_lossless(loaded_image.path, pixel_jobs)
+        if paths is not None:
+            return paths
+
+    # Read just the crop region instead of decoding the whole source
+    if loaded_image.streamable and not loaded_image.is_full_ready():
+        return export_region(loaded_image.path, jobs, sizes=sizes, preset=preset)
+    return export_slices(loaded_image.full(), jobs, sizes=sizes, preset=preset)
+
+def is_export_key(key):
+    """Whether a task key belongs to a save, see split_and_save()"""
+    return isinstance(key, tuple) and key[0] == 'export'
 
 class WallpaperCropper(QMainWindow):
     def __init__(self):
         super().__init__()
         # Basic properties
         self.current_image = None
+        self.image_pyramid = None
+        self.cache_entry = None
         self.monitors = self.get_monitor_info()
         self.dragging = False
         self.drag_start = None
+        # The crop is kept as a float box in source pixels; crop_rect is
+        # its rounded display rect, rederived whenever the view changes
+        self.crop_box = None
         self.crop_rect = None
         self.resize_handle = None
         self.handle_size = 5
         self.resize_mode = None
         
-        # Calculate total width and height of monitors
-        self.total_width = sum(monitor.width() for monitor in self.monitors)
-        self.total_height = max(monitor.height() for monitor in self.monitors)
-        # Calculate the aspect ratio based on both monitors
-        self.target_aspect_ratio = self.total_width / self.total_height
+        # Calculate the bounding box of all monitors and its aspect ratio
+        self.total_width = self.layout_model.width
+        self.total_height = self.layout_model.height
+        self.target_aspect_ratio = self.layout_model.aspect_ratio
+        self._monitor_boxes_key = None
+        self._monitor_boxes = []
         
         # Initialize caching properties
         self.cached_scaled_pixmap = None
         self.last_label_size = None
-        self._preview_counter = 0
+        self._view_geometry = None
+        
+        # Recently opened images stay decoded for fast switching
+        self.image_cache = ImageCache()
+        self.library_window = None
+        self.started = False
+        
+        # Neighbours in the current image's folder, decoded ahead of time
+        self.folder = None
+        self.folder_images = []
+        # Set when folder_images is a list of images given on the command line
+        self.given_images = False
+        self.prefetching = set()
+        self.waiting_for = None
+        
+        # Decoding, preview rendering and export run off the GUI thread
+        self.tasks = TaskExecutor(self)
+        self.prefetch_tasks = TaskExecutor(self, max_threads=1)
+        
+        # Repaints are coalesced into one frame per display refresh; previews
+        # adapt their rate so rendering them takes at most a quarter of the time
+        screen = QApplication.primaryScreen()
+        self.frame_scheduler = FrameScheduler(
+            self.render_frame, screen.refreshRate() if screen else 60.0, self
+        )
+        self.frame_scheduler.set_throttled(REGION_PREVIEWS, 0.25)
         
         self.init_ui()
+        
+        # FPS and stage timings on the canvas when WALLCROP_PROFILE is set
+        if profiler.enabled:
+            self.stats_timer = QTimer(self)
+            self.stats_timer.timeout.connect(self.update_stats_overlay)
+            self.stats_timer.start(STATS_INTERVAL_MS)
 
     def init_ui(self):
-        self.setWindowTitle('Dual Monitor Wallpaper Cropper')
-        self.setGeometry(100, 100, 1200, 800)
-        
-        # Modern dark theme styling
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1a1a1a;
-            }
-            QPushButton {
-                background-color: #2d89ef;
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                border-radius: 6px;
-                font-weight: bold;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #3999ff;
-            }
-            QPushButton:pressed {
-                background-color: #2076d8;
-            }
-            QLabel {
-                color: white;
-                font-size: 14px;
-            }
-            QGroupBox {
-                color: #ffffff;
-                border: 2px solid #333333;
-                border-radius: 10px;
-                margin-top: 1.5em;
-                padding: 15px;
-                background-color: #242424;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                padding: 0 15px;
-                color: #2d89ef;
-                font-weight: bold;
-                font-size: 14px;
-            }
-        """)
+        self.setWindowTitle('Multi-Monitor Wallpaper Cropper')
+        self.setStyleSheet(STYLESHEET)
 
         # Create central widget and layout
         central_widget = QWidget()
@@ -86,81 +293,43 @@ class WallpaperCropper(QMainWindow):
         layout.setSpacing(25)
         layout.setContentsMargins(30, 30, 30, 30)
 
-        # Create image display area with modern styling
-        self.image_label = QLabel()
-        self.image_label.setMinimumSize(800, 400)
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.image_label.setStyleSheet("""
-            QLabel {
-                background-color: #242424;
-                border-radius: 10px;
-                border: 2px solid #333333;
-            }
-        """)
-        layout.addWidget(self.image_label)
-
-        # Create preview area with modern styling
+        # Create image display area; only the crop overlay repaints while dragging
+        self.canvas = CropCanvas(self.handle_size)
+        self.canvas.setMinimumSize(800, 400)
+        layout.addWidget(self.canvas)
+
+        # Create preview area with modern styling, one preview per monitor
         preview_layout = QHBoxLayout()
         preview_layout.setSpacing(20)
+        self.previews = []
         
-        # Left monitor preview
-        preview_group1 = QGroupBox(f"Monitor 1 ({self.monitor_info[0]['resolution']} - {self.monitor_info[0]['ratio']})")
-        preview_layout1 = QVBoxLayout(preview_group1)
-        preview_layout1.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        # Create a container widget for the bezel effect
-        left_container = QWidget()
-        left_container.setStyleSheet("""
-            QWidget {
-                background-color: #242424;
-                border-radius: 8px;
-                padding: 10px;
-            }
-        """)
-        left_container_layout = QVBoxLayout(left_container)
-        left_container_layout.setContentsMargins(10, 10, 10, 10)
-        
-        self.left_preview = QLabel()
-        self.left_preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.left_preview.setStyleSheet("""
-            QLabel {
-                background-color: #1a1a1a;
-                border: none;
-            }
-        """)
-        left_container_layout.addWidget(self.left_preview)
-        preview_layout1.addWidget(left_container)
-        
-        # Right monitor preview
-        preview_group2 = QGroupBox(f"Monitor 2 ({self.monitor_info[1]['resolution']} - {self.monitor_info[1]['ratio']})")
-        preview_layout2 = QVBoxLayout(preview_group2)
-        preview_layout2.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        # Create a container widget for the bezel effect
-        right_container = QWidget()
-        right_container.setStyleSheet("""
-            QWidget {
-                background-color: #242424;
-                border-radius: 8px;
-                padding: 10px;
-            }
-        """)
-        right_container_layout = QVBoxLayout(right_container)
-        right_container_layout.setContentsMargins(10, 10, 10, 10)
-        
-        self.right_preview = QLabel()
-        self.right_preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.right_preview.setStyleSheet("""
-            QLabel {
-                background-color: #1a1a1a;
-                border: none;
-            }
-        """)
-        right_container_layout.addWidget(self.right_preview)
-        preview_layout2.addWidget(right_container)
+        for index, info in enumerate(self.monitor_info):
+            preview_group = QGroupBox(f"Monitor {index + 1} ({info['resolution']} - {info['ratio']})")
+            group_layout = QVBoxLayout(preview_group)
+            group_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            group_layout.setContentsMargins(15, 25, 15, 15)
+            
+            # Create a container widget for the bezel effect
+            container = QWidget()
+            container.setObjectName('previewFrame')
+            container_layout = QVBoxLayout(container)
+            container_layout.setContentsMargins(10, 10, 10, 10)
+            
+            preview = QLabel()
+            preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            preview.setObjectName('preview')
+            
+            # Size the preview to match this monitor's aspect ratio
+            geometry = info['geometry']
+            preview_width = 320  # Base width
+            preview_height = int(preview_width * geometry.height() / geometry.width())
+            preview.setFixedSize(preview_width, preview_height)
+            
+            container_layout.addWidget(preview)
+            group_layout.addWidget(container)
+            preview_layout.addWidget(preview_group)
+            self.previews.append(preview)
         
-        preview_layout.addWidget(preview_group1)
-        preview_layout.addWidget(preview_group2)
         layout.addLayout(preview_layout)
 
         # Create button layout with modern styling
@@ -174,6 +343,20 @@ class WallpaperCropper(QMainWindow):
         button_layout.addWidget(load_button)
         load_button.clicked.connect(self.load_image)
         
+        # Library button
+        library_button = QPushButton('Library')
+        library_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        library_button.setMinimumWidth(150)
+        button_layout.addWidget(library_button)
+        library_button.clicked.connect(self.show_library)
+        
+        # Recent images, switched to from the cache without decoding again
+        self.recent_combo = QComboBox()
+        self.recent_combo.setMinimumWidth(200)
+        self.recent_combo.setPlaceholderText('Recent images')
+        button_layout.addWidget(self.recent_combo)
+        self.recent_combo.activated.connect(self.open_recent)
+        
         # Save button
         save_button = QPushButton('Save')
         save_button.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -181,21 +364,37 @@ class WallpaperCropper(QMainWindow):
         button_layout.addWidget(save_button)
         save_button.clicked.connect(self.split_and_save)
         
+        # Encoder preset: speed versus file size of the saved wallpapers
+        self.preset_combo = QComboBox()
+        for preset in PRESETS:
+            self.preset_combo.addItem(preset.capitalize(), preset)
+        self.preset_combo.setCurrentIndex(PRESETS.index(DEFAULT_PRESET))
+        self.preset_combo.setToolTip('Fast: quickest save, larger files\n'
+                                     'Balanced: good quality and size\n'
+                                     'Archive: best quality, slowest save')
+        button_layout.addWidget(self.preset_combo)
+        
+        # Cut JPEG wallpapers from JPEG sources without re-encoding
+        self.lossless_check = QCheckBox('Lossless JPEG')
+        self.lossless_check.setToolTip('Cut JPEG slices straight from a JPEG source with jpegtran,\n'
+                                       'without re-encoding; slices keep the source resolution\n'
+                                       'and may shift by up to 15 pixels')
+        # Enabled after the first frame, once jpegtran has been looked for
+        self.lossless_check.setEnabled(False)
+        button_layout.addWidget(self.lossless_check)
+        
+        # Place the crop of new images by their content instead of centering it
+        self.auto_crop_check = QCheckBox('Auto crop')
+        self.auto_crop_check.setToolTip('Move the crop to the detailed part of the image,\n'
+                                        'keeping subjects off the monitor split lines')
+        self.auto_crop_check.toggled.connect(self.auto_crop_toggled)
+        button_layout.addWidget(self.auto_crop_check)
+        
         # Exit button
         exit_button = QPushButton('Exit')
         exit_button.setCursor(Qt.CursorShape.PointingHandCursor)
         exit_button.setMinimumWidth(150)
-        exit_button.setStyleSheet("""
-            QPushButton {
-                background-color: #dc3545;  /* Red color for exit */
-            }
-            QPushButton:hover {
-                background-color: #e04755;
-            }
-            QPushButton:pressed {
-                background-color: #c82333;
-            }
-        """)
+        exit_button.setObjectName('exitButton')
         button_layout.addWidget(exit_button)
         exit_button.clicked.connect(self.close)  # Qt's built-in close method
         
@@ -203,66 +402,329 @@ class WallpaperCropper(QMainWindow):
         layout.addLayout(button_layout)
 
         # Setup event handling
-        self.image_label.mousePressEvent = self.mouse_press_event
-        self.image_label.mouseMoveEvent = self.mouse_move_event
-        self.image_label.mouseReleaseEvent = self.mouse_release_event
-
-        # Update preview sizes to match monitor aspect ratio
-        single_monitor_ratio = self.total_width / (2 * self.total_height)  # Divide by 2 for single monitor
-        preview_width = 320  # Base width
-        preview_height = int(preview_width / single_monitor_ratio)
+        self.canvas.mousePressEvent = self.mouse_press_event
+        self.canvas.mouseMoveEvent = self.mouse_move_event
+        self.canvas.mouseReleaseEvent = self.mouse_release_event
+        self.canvas.resizeEvent = self.canvas_resize_event
         
-        self.left_preview.setFixedSize(preview_width, preview_height)
-        self.right_preview.setFixedSize(preview_width, preview_height)
+        self.restore_settings()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        # Work the first frame does not need runs once it is on screen
+        if not self.started:
+            self.started = True
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        # Also imports export on this thread, which reads the umask
+        # before any save can run in the background
+        from lossless_jpeg import find_jpegtran
+        self.lossless_check.setEnabled(find_jpegtran() is not None)
+        if not self.lossless_check.isEnabled():
+            self.lossless_check.setChecked(False)
+
+    def restore_settings(self):
+        """Restore the window geometry and export options of the last session"""
+        settings = QSettings(*SETTINGS_SCOPE)
+        geometry = settings.value('window/geometry')
+        if geometry is None or not self.restoreGeometry(geometry):
+            self.setGeometry(100, 100, 1200, 800)
 
-        # Set margins for preview layouts
-        preview_layout1.setContentsMargins(15, 25, 15, 15)
-        preview_layout2.setContentsMargins(15, 25, 15, 15)
+        preset = settings.value('export/preset', DEFAULT_PRESET)
+        if preset in PRESETS:
+            self.preset_combo.setCurrentIndex(PRESETS.index(preset))
+        self.lossless_check.setChecked(settings.value('export/lossless', False, type=bool))
+        self.auto_crop_check.setChecked(settings.value('crop/auto', False, type=bool))
+
+    def save_settings(self):
+        settings = QSettings(*SETTINGS_SCOPE)
+        settings.setValue('window/geometry', self.saveGeometry())
+        settings.setValue('export/preset', self.preset_combo.currentData())
+        settings.setValue('export/lossless', self.lossless_check.isChecked())
+        settings.setValue('crop/auto', self.auto_crop_check.isChecked())
 
     def get_monitor_info(self):
         """Get information about connected monitors"""
+        screens = sorted(
+            QApplication.screens(),
+            key=lambda screen: (screen.geometry().x(), screen.geometry().y())
+        )
         monitors = []
-        for screen in QApplication.screens():
+        # Store additional info about each monitor
+        self.monitor_info = []
+        for screen in screens:
             geometry = screen.geometry()
             monitors.append(geometry)
-            # Store additional info about each monitor
-            self.monitor_info = []
-            for screen in QApplication.screens():
-                info = {
-                    'geometry': screen.geometry(),
-                    'resolution': f"{screen.geometry().width()}x{screen.geometry().height()}",
-                    'ratio': f"{screen.geometry().width()}/{screen.geometry().height()}"
-                }
-                self.monitor_info.append(info)
+            self.monitor_info.append({
+                'geometry': geometry,
+                'resolution': f"{geometry.width()}x{geometry.height()}",
+                'ratio': f"{geometry.width()}/{geometry.height()}"
+            })
+
+        self.layout_model = MonitorLayout(
+            [(g.x(), g.y(), g.width(), g.height()) for g in monitors]
+        )
         return monitors
 
     def load_image(self):
         """Load an image file"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open Image", "", "Images (*.png *.jpg *.jpeg *.bmp *.gif)"
+            self, "Open Image", "", open_filter()
         )
         
         if file_path:
+            self.open_image(file_path)
+
+    def open_image(self, file_path):
+        """Show an image, from the cache if it is still there"""
+        entry = self.image_cache.get(file_path)
+        if entry is not None:
+            self.tasks.cancel('load')
+            self.waiting_for = None
+            self.show_entry(entry)
+            return
+
+        # Already being prefetched, show it as soon as it is ready
+        file_path = os.path.abspath(file_path)
+        if file_path in self.prefetching:
+            self.tasks.cancel('load')
+            self.waiting_for = file_path
+            return
+
+        print(f"Loading image from: {file_path}")
+        self.waiting_for = None
+
+        # Decode a reduced preview first, the full image follows in the background
+        self.tasks.submit(
+            'load',
+            load_entry,
+            file_path,
+            self.screen_size(),
+            auto_layout=self.auto_layout(),
+            on_done=self.set_loaded_image,
+            on_error=self.report_load_error
+        )
+
+    def open_paths(self, paths):
+        """Open the first of paths that is a file, e.g. sent by another launch
+
+        With several files they replace the folder for Page Up/Down and
+        prefetching, so the others are a key press away.
+        """
+        # Come to the front of whatever launched us, even with nothing to open
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+        files = [os.path.abspath(path) for path in paths if os.path.isfile(path)]
+        if len(files) > 1:
+            print(f"Opening {files[0]}, the first of {len(files)} images; Page Down shows the next")
+            self.folder = None
+            self.folder_images = files
+            self.given_images = True
+        if files:
+            self.open_image(files[0])
+        elif paths:
+            print(f"Nothing to open in: {', '.join(paths)}")
+
+    def auto_layout(self):
+        """Layout new crops are auto-placed for, or None when auto crop is off"""
+        return self.layout_model if self.auto_crop_check.isChecked() else None
+
+    def auto_crop_toggled(self, checked):
+        """Auto-place the crop of the current image when auto crop is switched on"""
+        geometry = self.view_geometry()
+        if not checked or not self.image_pyramid or geometry is None or not geometry.is_valid():
+            return
+        self.set_crop_box(auto_crop_of(self.image_pyramid, self.layout_model))
+        self.frame_scheduler.request(REGION_OVERLAY, REGION_PREVIEWS)
+
+    def show_adjacent(self, step):
+        """Open the next (step > 0) or previous image of the current folder"""
+        if not self.current_image or not self.folder_images:
+            return
+        path = os.path.abspath(self.current_image.path)
+        try:
+            index = self.folder_images.index(path)
+        except ValueError:
+            return
+        index += step
+        if 0 <= index < len(self.folder_images):
+            self.open_image(self.folder_images[index])
+
+    def update_folder(self, path):
+        """List the images in the folder of path, once per folder"""
+        folder = os.path.dirname(os.path.abspath(path))
+        if self.given_images and path in self.folder_images:
+            return
+        if folder != self.folder or path not in self.folder_images:
+            self.given_images = False
             try:
-                print(f"Loading image from: {file_path}")
-                self.current_image = Image.open(file_path)
-                print(f"Image loaded successfully. Size: {self.current_image.size}, Mode: {self.current_image.mode}")
-                
-                # Reset caching properties
-                self.cached_scaled_pixmap = None
-                self.last_label_size = None
-                
-                # Initialize crop rectangle
-                image_rect = self.get_image_display_rect()
-                self.crop_rect = self.calculate_initial_crop_rect(image_rect)
-                
-                # Force a complete update
-                self._do_update()
-                
-            except Exception as e:
-                print(f"Error loading image: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                from library_index import scan_folder
+                self.folder_images = sorted(scan_folder(folder))
+            except OSError:
+                self.folder_images = []
+            self.folder = folder
+
+    def prefetch_neighbours(self):
+        """Decode the images around the current one while it is being edited"""
+        path = os.path.abspath(self.current_image.path)
+        self.update_folder(path)
+        if path not in self.folder_images:
+            return
+
+        index = self.folder_images.index(path)
+        wanted = []
+        for distance in range(1, PREFETCH_DISTANCE + 1):
+            for neighbour in (index + distance, index - distance):
+                if 0 <= neighbour < len(self.folder_images):
+                    wanted.append(self.folder_images[neighbour])
+
+        # Drop prefetches the user has moved away from
+        for stale in self.prefetching - set(wanted):
+            self.prefetch_tasks.cancel(('prefetch', stale))
+        self.prefetching &= set(wanted)
+
+        view_size = (self.canvas.width(), self.canvas.height())
+        for neighbour in wanted:
+            if neighbour in self.prefetching or neighbour in self.image_cache:
+                continue
+            self.prefetching.add(neighbour)
+            self.prefetch_tasks.submit(
+                ('prefetch', neighbour),
+                load_entry,
+                neighbour,
+                self.screen_size(),
+                view_size,
+                start_full=False,
+                auto_layout=self.auto_layout(),
+                on_done=self.store_prefetched,
+                on_error=lambda error, neighbour=neighbour: self.prefetch_failed(neighbour, error)
+            )
+
+    def store_prefetched(self, entry):
+        path = entry.key[0]
+        self.prefetching.discard(path)
+        if path == self.waiting_for:
+            self.waiting_for = None
+            self.set_loaded_image(entry)
+        else:
+            self.image_cache.put(entry, prefetched=True)
+
+    def prefetch_failed(self, path, error):
+        self.prefetching.discard(path)
+        if path == self.waiting_for:
+            self.waiting_for = None
+            self.report_load_error(error)
+
+    def show_library(self):
+        """Open the thumbnail grid of a wallpaper folder"""
+        if self.library_window is None:
+            from library_view import LibraryWindow
+            self.library_window = LibraryWindow(self.layout_model.aspect_ratio)
+            self.library_window.image_selected.connect(self.open_image)
+        elif self.library_window.folder:
+            # Pick up files added since the library was last open
+            self.library_window.open_folder(self.library_window.folder)
+        self.library_window.show()
+        self.library_window.raise_()
+        self.library_window.activateWindow()
+
+    def open_recent(self, index):
+        path = self.recent_combo.itemData(index)
+        if path:
+            self.open_image(path)
+
+    def screen_size(self):
+        """Largest monitor width and height"""
+        return (
+            max(m.width() for m in self.monitors),
+            max(m.height() for m in self.monitors)
+        )
+
+    def report_load_error(self, error):
+        print(f"Error loading image: {str(error)}")
+
+    def set_loaded_image(self, entry):
+        """Show a freshly decoded image and cache it"""
+        loaded_image = entry.loaded_image
+        print(f"Image loaded successfully. Size: {loaded_image.size}, "
+              f"Preview: {loaded_image.preview.size}, Mode: {loaded_image.mode}")
+        self.show_entry(entry)
+
+    def show_entry(self, entry):
+        """Switch to a cached image, restoring its display pixmap and crop"""
+        try:
+            self.remember_current()
+            if self.current_image and entry.loaded_image is not self.current_image:
+                self.current_image.cancel()
+            self.tasks.cancel('preview')
+
+            self.cache_entry = entry
+            self.current_image = entry.loaded_image
+            self.image_pyramid = entry.pyramid
+            self.image_cache.put(entry)
+            
+            # Export needs the full decode, which prefetching skipped;
+            # streamable images are exported by region instead
+            self.current_image.prepare_full()
+            
+            # Upload a display image prepared by the prefetcher
+            if entry.display_image is not None:
+                entry.pixmap = QPixmap.fromImage(entry.display_image)
+                entry.pixmap_view_size = entry.display_view_size
+                entry.display_image = None
+            
+            # Reuse the display pixmap if it was made for this view size
+            self.cached_scaled_pixmap = entry.pixmap
+            self.last_label_size = entry.pixmap_view_size
+            self._view_geometry = None
+            self.crop_box = None
+            
+            # Restore the last crop, or start with the default one
+            self.set_crop_box(entry.crop_box or self.calculate_initial_crop_box())
+            
+            self.update_recent_list()
+            
+            # Force a complete update
+            self.frame_scheduler.request(REGION_IMAGE, REGION_OVERLAY, REGION_PREVIEWS)
+            self.prefetch_neighbours()
+            
+        except Exception as e:
+            profiler.error(f"Error loading image: {str(e)}")
+
+    def remember_current(self):
+        """Store the crop and display pixmap of the current image in its cache entry"""
+        entry = self.cache_entry
+        if entry is None:
+            return
+        if self.crop_box:
+            entry.crop_box = self.crop_box
+        entry.pixmap = self.cached_scaled_pixmap
+        entry.pixmap_view_size = self.last_label_size
+
+    def update_recent_list(self):
+        """List the cached images, most recent first"""
+        self.recent_combo.blockSignals(True)
+        self.recent_combo.clear()
+        for path in self.image_cache.recent():
+            self.recent_combo.addItem(os.path.basename(path), path)
+            self.recent_combo.setItemData(
+                self.recent_combo.count() - 1, path, Qt.ItemDataRole.ToolTipRole
+            )
+        self.recent_combo.setCurrentIndex(0 if self.recent_combo.count() else -1)
+        self.recent_combo.blockSignals(False)
+
+    def render_frame(self, regions):
+        """Render the dirty regions of one frame"""
+        if REGION_IMAGE in regions:
+            self._do_update()
+        elif REGION_OVERLAY in regions:
+            self.update_overlay()
+        if REGION_PREVIEWS in regions:
+            self.update_cropped_previews(self.crop_rect)
 
     def _do_update(self):
         """Perform the actual display update"""
@@ -271,120 +733,101 @@ class WallpaperCropper(QMainWindow):
             return
 
         try:
-            current_size = (self.image_label.width(), self.image_label.height())
+            current_size = (self.canvas.width(), self.canvas.height())
             
-            # Initialize cached_scaled_pixmap if needed
+            # Rebuild the image layer only when the canvas size changed
             if self.cached_scaled_pixmap is None or self.last_label_size != current_size:
-                pixmap = self.pil_to_pixmap(self.current_image)
+                image_rect = self.get_image_display_rect()
+                level = self.image_pyramid.level_for(image_rect.width(), image_rect.height())
+                pixmap = self.pil_to_pixmap(level, image_rect.width(), image_rect.height())
                 if pixmap and not pixmap.isNull():
-                    self.cached_scaled_pixmap = pixmap.scaled(
-                        self.image_label.width(),
-                        self.image_label.height(),
-                        Qt.AspectRatioMode.KeepAspectRatio
-                    )
+                    self.cached_scaled_pixmap = pixmap
                     self.last_label_size = current_size
                 else:
                     return
             
-            # Create display pixmap
-            display_pixmap = QPixmap(self.image_label.size())
-            display_pixmap.fill(QColor('#2a2a2a'))
-            
-            # Draw the cached scaled image
-            painter = QPainter(display_pixmap)
-            if self.cached_scaled_pixmap and not self.cached_scaled_pixmap.isNull():
-                x = (self.image_label.width() - self.cached_scaled_pixmap.width()) // 2
-                y = (self.image_label.height() - self.cached_scaled_pixmap.height()) // 2
-                painter.drawPixmap(x, y, self.cached_scaled_pixmap)
-            
-                # Draw crop rectangle and handles
-                if self.crop_rect:
-                    # Set up semi-transparent white fill
-                    painter.setBrush(QColor(255, 255, 255, 30))  # Last parameter is alpha (0-255)
-                    painter.setPen(QPen(QColor('#ffffff'), 2))  # White border
-                    painter.drawRect(self.crop_rect)
-                    
-                    # Draw middle line
-                    middle_x = self.crop_rect.x() + self.crop_rect.width() // 2
-                    painter.setPen(QPen(QColor('#ffffff'), 1, Qt.PenStyle.DashLine))  # Dashed white line
-                    painter.drawLine(
-                        middle_x, 
-                        self.crop_rect.top(),
-                        middle_x, 
-                        self.crop_rect.bottom()
-                    )
-                    
-                    # Draw resize handles
-                    handle_size = self.handle_size
-                    painter.setPen(QPen(QColor('#ffffff'), 1))
-                    painter.setBrush(QColor('#ffffff'))  # Solid white handles
-                    
-                    corners = [
-                        self.crop_rect.topLeft(),
-                        self.crop_rect.topRight(),
-                        self.crop_rect.bottomRight(),
-                        self.crop_rect.bottomLeft()
-                    ]
-                    
-                    for corner in corners:
-                        painter.drawRect(
-                            corner.x() - handle_size, 
-                            corner.y() - handle_size,
-                            handle_size * 2, 
-                            handle_size * 2
-                        )
-            
-            painter.end()
-            self.image_label.setPixmap(display_pixmap)
-            
-            # Update previews with reduced frequency during dragging
-            if not self.dragging or self._preview_counter == 0:
-                self.update_cropped_previews(self.crop_rect)
-            self._preview_counter = (self._preview_counter + 1) % 3
+            self.canvas.set_image(self.cached_scaled_pixmap, self.get_image_display_rect().topLeft())
+            self.update_overlay()
                 
         except Exception as e:
-            print(f"Error in _do_update: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            profiler.error(f"Error in _do_update: {str(e)}")
+
+    def update_overlay(self):
+        """Move the crop overlay on the canvas"""
+        monitor_rects = []
+        if self.crop_rect:
+            monitor_rects = [
+                QRectF(x1, y1, x2 - x1, y2 - y1)
+                for x1, y1, x2, y2 in self.layout_model.map_box_f((
+                    self.crop_rect.x(), self.crop_rect.y(),
+                    self.crop_rect.x() + self.crop_rect.width(),
+                    self.crop_rect.y() + self.crop_rect.height()
+                ))
+            ]
+        self.canvas.set_overlay(self.crop_rect, monitor_rects)
+
+    def view_geometry(self):
+        """Get the cached view geometry, rebuilding it only after a load or resize"""
+        if not self.current_image:
+            return None
+
+        view_size = (self.canvas.width(), self.canvas.height())
+        geometry = self._view_geometry
+        if (geometry is None or geometry.view_size != view_size
+                or geometry.image_size != self.current_image.size):
+            geometry = ViewGeometry(self.current_image.size, view_size)
+            self._view_geometry = geometry
+            if self.crop_box and geometry.is_valid():
+                self.crop_rect = geometry.to_display_rect(self.crop_box)
+        return geometry
+
+    def set_crop_box(self, box):
+        """Set the crop in source pixels, forcing the monitors' exact aspect ratio"""
+        from cropping import fit_crop_box
+        self.crop_box = fit_crop_box(box, self.target_aspect_ratio, self.current_image.size)
+        geometry = self.view_geometry()
+        if geometry.is_valid():
+            self.crop_rect = geometry.to_display_rect(self.crop_box)
+
+    def set_crop_rect(self, rect):
+        """Set the crop from an edited display rect"""
+        from cropping import fit_crop_box
+        geometry = self.view_geometry()
+        if geometry is None or not geometry.is_valid():
+            return
+        self.crop_box = fit_crop_box(
+            geometry.to_source_box(rect), self.target_aspect_ratio, self.current_image.size
+        )
+        self.crop_rect = geometry.to_display_rect(self.crop_box)
+
+    def monitor_source_boxes(self):
+        """Per-monitor float crop boxes in source pixels, recomputed only when the crop changes"""
+        if not self.crop_box:
+            return []
+
+        if self.crop_box != self._monitor_boxes_key:
+            self._monitor_boxes = self.layout_model.map_box_f(self.crop_box)
+            self._monitor_boxes_key = self.crop_box
+        return self._monitor_boxes
 
     def get_image_display_rect(self):
         """Get the rectangle where the image is actually displayed"""
-        if not self.current_image:
+        geometry = self.view_geometry()
+        if geometry is None:
             return QRect()
+        return QRect(geometry.display_rect)
 
-        # Convert PIL image to QPixmap for display
-        pixmap = self.pil_to_pixmap(self.current_image)
-        
-        # Calculate scaled dimensions
-        scaled_pixmap = pixmap.scaled(
-            self.image_label.width(),
-            self.image_label.height(),
-            Qt.AspectRatioMode.KeepAspectRatio
-        )
-        
-        # Calculate position to center the image
-        x = (self.image_label.width() - scaled_pixmap.width()) // 2
-        y = (self.image_label.height() - scaled_pixmap.height()) // 2
-        
-        return QRect(x, y, scaled_pixmap.width(), scaled_pixmap.height())
-
-    def calculate_initial_crop_rect(self, image_rect):
-        """Calculate initial crop rectangle position and size"""
-        # Calculate the target height and width maintaining monitor aspect ratio
-        if image_rect.width() / image_rect.height() > self.target_aspect_ratio:
-            # Image is wider than needed, constrain by height
-            rect_height = int(image_rect.height() * 0.8)  # Use 80% of available height
-            rect_width = int(rect_height * self.target_aspect_ratio)
-        else:
-            # Image is taller than needed, constrain by width
-            rect_width = int(image_rect.width() * 0.8)  # Use 80% of available width
-            rect_height = int(rect_width / self.target_aspect_ratio)
-        
-        # Center the rectangle in the image
-        x = image_rect.x() + (image_rect.width() - rect_width) // 2
-        y = image_rect.y() + (image_rect.height() - rect_height) // 2
-        
-        return QRect(x, y, rect_width, rect_height)
+    def canvas_resize_event(self, event):
+        """Invalidate the view geometry when the canvas changes size"""
+        QWidget.resizeEvent(self.canvas, event)
+        self._view_geometry = None
+        if self.current_image:
+            self.frame_scheduler.request(REGION_IMAGE, REGION_OVERLAY, REGION_PREVIEWS)
+
+    def calculate_initial_crop_box(self):
+        """Calculate the initial crop box in source pixels"""
+        from cropping import initial_crop_box
+        return initial_crop_box(self.current_image.size, self.target_aspect_ratio)
 
     def get_resize_handle(self, pos):
         """Determine if position is on a resize handle"""
@@ -571,7 +1014,7 @@ class WallpaperCropper(QMainWindow):
             if (new_rect.width() >= min_width and 
                 new_rect.height() >= min_height and
                 image_rect.contains(new_rect)):
-                self.crop_rect = new_rect
+                self.set_crop_rect(new_rect)
         else:
             # Handle moving the entire rectangle
             new_rect = QRect(self.crop_rect)
@@ -590,7 +1033,7 @@ class WallpaperCropper(QMainWindow):
                 new_y = image_rect.bottom() - new_rect.height()
             
             new_rect.moveTopLeft(QPoint(int(new_x), int(new_y)))
-            self.crop_rect = new_rect
+            self.set_crop_rect(new_rect)
 
         self.drag_start = pos
         self.update_display()
@@ -608,34 +1051,16 @@ class WallpaperCropper(QMainWindow):
             return
 
         try:
-            # Get the image display area and crop rectangle
-            image_rect = self.get_image_display_rect()
-            if not self.crop_rect:
+            # Get the crop box of every monitor in original image space
+            monitor_boxes = self.monitor_source_boxes()
+            if not monitor_boxes:
                 return
 
-            # Get original image dimensions
-            orig_width, orig_height = self.current_image.size
-            
-            # Calculate scaling factors from display coordinates to original image
-            scale_x = orig_width / image_rect.width()
-            scale_y = orig_height / image_rect.height()
-
-            # Calculate crop coordinates in original image space
-            x1 = max(0, int((self.crop_rect.x() - image_rect.x()) * scale_x))
-            y1 = max(0, int((self.crop_rect.y() - image_rect.y()) * scale_y))
-            x2 = min(orig_width, int((self.crop_rect.right() - image_rect.x()) * scale_x))
-            y2 = min(orig_height, int((self.crop_rect.bottom() - image_rect.y()) * scale_y))
-
-            # Calculate the middle point for splitting
-            middle_x = x1 + (x2 - x1) // 2
-
-            # Crop left and right portions
-            monitor1_crop = self.current_image.crop((x1, y1, middle_x, y2))
-            monitor2_crop = self.current_image.crop((middle_x, y1, x2, y2))
-
             # Save dialog
+            from encoder_presets import supported_extensions
             file_path, _ = QFileDialog.getSaveFileName(
-                self, "Save Wallpapers", "", "Images (*.png *.jpg *.jpeg)"
+                self, "Save Wallpapers", "",
+                "Images ({})".format(' '.join(f'*{ext}' for ext in supported_extensions()))
             )
             
             if file_path:
@@ -643,121 +1068,122 @@ class WallpaperCropper(QMainWindow):
                 base_name = os.path.splitext(file_path)[0]
                 ext = os.path.splitext(file_path)[1]
                 
-                # Save both images
-                monitor1_path = f"{base_name}_left{ext}"
-                monitor2_path = f"{base_name}_right{ext}"
-                
-                monitor1_crop.save(monitor1_path)
-                monitor2_crop.save(monitor2_path)
-                
-                print(f"Saved wallpapers:\n{monitor1_path}\n{monitor2_path}")
+                # Crop and save every monitor's slice from the full-resolution decode in the background
+                # Every slice is resampled once, straight to its monitor's resolution
+                jobs = [
+                    (box, f"{base_name}{suffix}{ext}")
+                    for box, suffix in zip(monitor_boxes, self.layout_model.suffixes())
+                ]
+                self.tasks.submit(
+                    ('export', base_name),
+                    export_wallpapers,
+                    self.current_image,
+                    jobs,
+                    self.preset_combo.currentData(),
+                    self.lossless_check.isChecked(),
+                    self.layout_model.sizes(),
+                    on_done=self.report_saved
+                )
 
         except Exception as e:
-            print(f"Error in split_and_save: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            profiler.error(f"Error in split_and_save: {str(e)}")
+
+    def report_saved(self, paths):
+        print("Saved wallpapers:\n" + "\n".join(paths))
 
-    def pil_to_pixmap(self, pil_image):
-        """Convert PIL image to QPixmap"""
+    def pil_to_pixmap(self, pil_image, width=None, height=None):
+        """Convert PIL image to QPixmap, optionally scaling it on the way"""
         try:
-            # Ensure image is in RGB mode
-            if pil_image.mode != "RGB":
-                print(f"Converting image from {pil_image.mode} to RGB")  # Debug print
-                pil_image = pil_image.convert("RGB")
-            
-            # Get image data
-            width, height = pil_image.size
-            bytes_per_line = 3 * width
-            
-            # Convert PIL image to QImage
-            image_data = pil_image.tobytes("raw", "RGB")
-            qimage = QImage(image_data, width, height, bytes_per_line, QImage.Format.Format_RGB888)
-            
-            if qimage.isNull():
-                raise ValueError("Failed to create QImage")
-            
-            # Convert QImage to QPixmap
-            pixmap = QPixmap.fromImage(qimage)
-            
-            if pixmap.isNull():
-                raise ValueError("Failed to create QPixmap")
-            
-            return pixmap
+            if width is None or height is None:
+                width, height = pil_image.size
+            if width <= 0 or height <= 0:
+                return QPixmap()
+            return pil_to_scaled_pixmap(pil_image, width, height)
             
         except Exception as e:
-            print(f"Error in pil_to_pixmap: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            profiler.error(f"Error in pil_to_pixmap: {str(e)}")
             return QPixmap()
 
     def update_cropped_previews(self, rect):
-        """Update preview windows with split monitor views"""
-        if not self.current_image or not rect or not self.cached_scaled_pixmap:
+        """Update preview windows with per-monitor views"""
+        if not self.current_image or not rect or not self.image_pyramid:
             return
 
         try:
-            # Get the actual image display area
-            image_rect = self.get_image_display_rect()
-            
-            # Calculate relative position within the image rect
-            rel_x = rect.x() - image_rect.x()
-            rel_y = rect.y() - image_rect.y()
-            
-            # Split the crop rectangle exactly in half for dual monitors
-            half_width = rect.width() // 2
-            
-            # Create left and right crop rectangles relative to the scaled image
-            left_rect = QRect(
-                rel_x,
-                rel_y,
-                half_width,
-                rect.height()
-            )
-            
-            right_rect = QRect(
-                rel_x + half_width,  # Start from middle
-                rel_y,
-                half_width,
-                rect.height()
-            )
-            
-            # Create preview pixmaps from the correct portions of the scaled image
-            if (left_rect.right() <= self.cached_scaled_pixmap.width() and 
-                right_rect.right() <= self.cached_scaled_pixmap.width()):
-                left_preview = self.cached_scaled_pixmap.copy(left_rect)
-                right_preview = self.cached_scaled_pixmap.copy(right_rect)
-                
-                # Get preview dimensions that match monitor aspect ratio
-                single_monitor_ratio = self.total_width / (2 * self.total_height)  # Single monitor ratio
-                preview_width = self.left_preview.width()
-                preview_height = int(preview_width / single_monitor_ratio)
+            labels = []
+            jobs = []
+            for preview_label, box, monitor_size in zip(
+                    self.previews, self.monitor_source_boxes(), self.layout_model.sizes()):
+                x1, y1, x2, y2 = box
+                if x2 <= x1 or y2 <= y1:
+                    continue
                 
-                # Scale previews to match preview window size
-                left_preview = left_preview.scaled(
-                    preview_width,
-                    preview_height,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
+                # Render straight from the pyramid level closest to the preview size
+                size = QSize(*monitor_size).scaled(
+                    preview_label.width(), preview_label.height(), Qt.AspectRatioMode.KeepAspectRatio
                 )
-                
-                right_preview = right_preview.scaled(
-                    preview_width,
-                    preview_height,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
+                size = (size.width(), size.height())
+                if size[0] <= 0 or size[1] <= 0:
+                    continue
+                labels.append(preview_label)
+                jobs.append((box, size))
+
+            # Render in the background, superseding any preview still in flight
+            if jobs:
+                self.tasks.submit(
+                    'preview',
+                    render_previews,
+                    self.image_pyramid,
+                    jobs,
+                    on_done=lambda result: self.show_previews(labels, *result)
                 )
                 
-                # Set the previews directly
-                self.left_preview.setPixmap(left_preview)
-                self.right_preview.setPixmap(right_preview)
-                
         except Exception as e:
-            print(f"Error updating previews: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            profiler.error(f"Error updating previews: {str(e)}")
+
+    def update_stats_overlay(self):
+        frames = self.frame_scheduler.stats()
+        lines = [f"{frames['fps']:5.1f} fps  frame avg {frames['avg_ms']:.2f} / p95 {frames['p95_ms']:.2f} ms"]
+        stages = profiler.summary()
+        for name in OVERLAY_STAGES:
+            stats = stages['stages'].get(name)
+            if stats:
+                lines.append(f"{name:8} p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f}  "
+                             f"max {stats['max_ms']:8.2f} ms")
+        peak = peak_memory()
+        if peak is not None:
+            lines.append(f"peak memory {peak / (1024 * 1024):.0f} MB")
+        self.canvas.set_stats(lines)
+
+    def show_previews(self, labels, images, render_time):
+        self.frame_scheduler.record_cost(REGION_PREVIEWS, render_time)
+        for preview_label, image in zip(labels, images):
+            preview_label.setPixmap(QPixmap.fromImage(image))
+
+    def closeEvent(self, event):
+        """Stop background work before the window goes away"""
+        self.save_settings()
+        # Saves still in flight are finished, not dropped
+        if any(is_export_key(key) for key in self.tasks.busy_keys()):
+            print("Waiting for wallpapers still being saved...")
+        self.tasks.shutdown(finish=is_export_key)
+        self.prefetch_tasks.shutdown()
+        if self.library_window is not None:
+            self.library_window.close()
+            self.library_window.shutdown()
+        profiler.finish()
+        super().closeEvent(event)
 
     def keyPressEvent(self, event):
         """Handle keyboard shortcuts"""
+        # Page Up/Down step through the images of the current folder
+        if event.key() == Qt.Key.Key_PageDown:
+            self.show_adjacent(1)
+            return
+        if event.key() == Qt.Key.Key_PageUp:
+            self.show_adjacent(-1)
+            return
+        
         if not self.crop_rect:
             return
         
@@ -766,10 +1192,12 @@ class WallpaperCropper(QMainWindow):
             step = 10
         
         if event.key() == Qt.Key.Key_Left:
-            self.crop_rect.moveLeft(max(
+            new_rect = QRect(self.crop_rect)
+            new_rect.moveLeft(max(
                 self.get_image_display_rect().left(),
                 self.crop_rect.left() - step
             ))
+            self.set_crop_rect(new_rect)
         # ... similar for other arrow keys ...
         
         self.update_display()
@@ -779,24 +1207,41 @@ class WallpaperCropper(QMainWindow):
         if not self.current_image:
             return
 
-        # Use QTimer for smoother updates during dragging
-        if hasattr(self, '_update_timer'):
-            self._update_timer.stop()
-        
-        if self.dragging:
-            # Reduce update frequency during dragging
-            if not hasattr(self, '_update_timer'):
-                self._update_timer = QTimer()
-                self._update_timer.timeout.connect(self._do_update)
-            self._update_timer.start(16)  # ~60 FPS
-        else:
-            self._do_update()
+        # Coalesced into the next frame; previews follow at their own adaptive rate
+        self.frame_scheduler.request(REGION_OVERLAY, REGION_PREVIEWS)
 
 def main():
+    # Headless batch mode: wallcrop batch <input> -o <output> -m 1920x1080,1920x1080
+    if sys.argv[1:2] == ['batch']:
+        import batch
+        sys.exit(batch.main(sys.argv[2:]))
+
     app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(
+        prog='wallcrop',
+        description='Crop one image into wallpapers for every monitor'
+    )
+    parser.add_argument('images', nargs='*', help='images to open; the first one is shown')
+    parser.add_argument('--new-instance', action='store_true',
+                        help='open a new window instead of handing the images to the running one')
+    args = parser.parse_args(app.arguments()[1:])
+
+    # A window is already open: give it the images and leave
+    from single_instance import InstanceServer, send_to_running
+    if not args.new_instance and send_to_running(args.images):
+        sys.exit(0)
+
     window = WallpaperCropper()
+    if not args.new_instance:
+        server = InstanceServer(parent=window)
+        if server.listen():
+            server.paths_received.connect(window.open_paths)
     window.show()
+    if args.images:
+        window.open_paths([os.path.abspath(path) for path in args.images])
     sys.exit(app.exec())
 
 if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -0,0 +1,64 @@
+import gc
+import warnings
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from batch import crop_file, run_batch
+from layout import MonitorLayout
+
+LAYOUT = MonitorLayout.side_by_side([(160, 90), (160, 90)])
+
+def noise(size, mode='RGB', seed=0):
+    bands = len(Image.new(mode, (1, 1)).getbands())
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], bands), dtype=np.uint8)
+    return Image.fromarray(pixels.squeeze(axis=2) if bands == 1 else pixels, mode)
+
+@pytest.mark.parametrize('name', ['source.jpg', 'source.png', 'source.ppm'])
+def test_crop_file_closes_its_source(tmp_path, name):
+    path = str(tmp_path / name)
+    noise((700, 300)).save(path)
+    # A handle left to the garbage collector warns when it is collected
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', ResourceWarning)
+        crop_file(path, str(tmp_path), LAYOUT, 'default', '.png')
+        gc.collect()
+    assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
+
+def transparent(mode):
+    image = Image.linear_gradient('L').resize((640, 240)).convert('RGBA')
+    # Left half fully transparent, right half opaque
+    alpha = Image.new('L', image.size, 255)
+    alpha.paste(0, (0, 0, 320, 240))
+    image.putalpha(alpha)
+    if mode == 'LA':
+        return image.convert('LA')
+    if mode == 'P':
+        image = image.convert('RGB').convert('P', palette=Image.Palette.ADAPTIVE, colors=255)
+        image.paste(255, (0, 0, 320, 240))
+        image.info['transparency'] = 255
+        return image
+    return image
+
+@pytest.mark.parametrize('mode', ['RGBA', 'LA', 'P'])
+@pytest.mark.parametrize('native', [True, False])
+def test_batch_saves_transparent_pngs_as_jpeg(tmp_path, mode, native):
+    source_dir = tmp_path / 'in'
+    output_dir = tmp_path / 'out'
+    source_dir.mkdir()
+    transparent(mode).save(source_dir / 'wall.png')
+
+    reports = []
+    files, _, failures = run_batch(
+        [str(source_dir / 'wall.png')], str(output_dir), LAYOUT, 'center', '.jpg',
+        workers=1, report=reports.append, native=native
+    )
+    assert (files, failures) == (1, 0), reports
+
+    with Image.open(output_dir / 'wall_left.jpg') as left, Image.open(output_dir / 'wall_right.jpg') as right:
+        assert left.format == right.format == 'JPEG'
+        assert left.mode == ('L' if mode == 'LA' else 'RGB')
+        # The transparent half is flattened onto black
+        assert max(left.convert('L').getextrema()) < 16
+        assert max(right.convert('L').getextrema()) > 64
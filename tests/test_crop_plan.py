@@ -0,0 +1,184 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from crop_plan import ANCHORS, DEFAULT_FILL, map_boxes, plan_crops, plan_monitor_boxes
+from cropping import fit_crop_box, initial_crop_box
+from export import export_slices
+from layout import MonitorLayout
+
+LAYOUTS = {
+    'side by side': MonitorLayout.side_by_side([(1920, 1080), (1920, 1080)]),
+    'mixed': MonitorLayout.side_by_side([(1920, 1080), (2560, 1440), (1280, 1024)]),
+    'stacked': MonitorLayout([(0, 0, 1920, 1080), (0, 1080, 2560, 1440)]),
+    'offset': MonitorLayout([(0, 300, 1080, 1920), (1080, 0, 2560, 1440), (3640, 180, 1920, 1200)]),
+}
+
+def reference_crop(image_size, aspect_ratio, anchor):
+    """The per-image starting crop as it was computed before crop_plan"""
+    fill = DEFAULT_FILL if anchor == 'default' else 1.0
+    width, height = image_size
+    if width / height > aspect_ratio:
+        crop_height = int(height * fill)
+        crop_width = int(crop_height * aspect_ratio)
+    else:
+        crop_width = int(width * fill)
+        crop_height = int(crop_width / aspect_ratio)
+    x = (width - crop_width) // 2
+    y = (height - crop_height) // 2
+    return x, y, x + crop_width, y + crop_height
+
+def reference_map(layout, box):
+    """The per-monitor split as it was computed before crop_plan"""
+    x1, y1, x2, y2 = box
+    width = x2 - x1
+    height = y2 - y1
+    return [
+        (x1 + round(fx1 * width), y1 + round(fy1 * height),
+         x1 + round(fx2 * width), y1 + round(fy2 * height))
+        for fx1, fy1, fx2, fy2 in layout.fractions
+    ]
+
+def random_sizes(count, seed=7):
+    return np.random.default_rng(seed).integers(16, 12000, (count, 2))
+
+def assert_edges_shared(layout, boxes):
+    """Monitors that touch on the desktop touch in the crop, without gaps or overlap"""
+    left = min(x for x, _, _, _ in layout.monitors)
+    top = min(y for _, y, _, _ in layout.monitors)
+    edges = ({}, {})
+    for (x, y, width, height), box in zip(layout.monitors, boxes):
+        for axis, desktop in ((0, (x - left, x - left + width)), (1, (y - top, y - top + height))):
+            for value, edge in zip(desktop, box[axis::2]):
+                assert edges[axis].setdefault(value, edge) == edge
+
+@pytest.mark.parametrize('anchor', ['default', 'center'])
+@pytest.mark.parametrize('layout', LAYOUTS.values(), ids=LAYOUTS.keys())
+def test_plan_matches_per_image_code(layout, anchor):
+    sizes = random_sizes(2000)
+    crops = plan_crops(sizes, layout.aspect_ratio, anchor)
+    monitor_boxes = plan_monitor_boxes(sizes, layout, anchor)
+    assert monitor_boxes.shape == (len(sizes), len(layout), 4)
+    for size, crop, boxes in zip(sizes.tolist(), crops.tolist(), monitor_boxes.tolist()):
+        expected = reference_crop(size, layout.aspect_ratio, anchor)
+        assert tuple(crop) == expected
+        assert initial_crop_box(size, layout.aspect_ratio, anchor) == expected
+        assert [tuple(box) for box in boxes] == reference_map(layout, expected)
+
+@pytest.mark.parametrize('anchor', ANCHORS)
+def test_every_anchor_fits_and_keeps_the_aspect_ratio(anchor):
+    aspect_ratio = 32 / 9
+    sizes = random_sizes(2000, seed=11)
+    for (width, height), (x1, y1, x2, y2) in zip(sizes.tolist(), plan_crops(sizes, aspect_ratio, anchor).tolist()):
+        assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height
+        # The constrained side is floored, so the other is at most a pixel short
+        assert abs((x2 - x1) - (y2 - y1) * aspect_ratio) <= aspect_ratio + 1
+        # Every anchor centers the crop horizontally
+        assert abs(x1 - (width - x2)) <= 1
+
+def test_vertical_anchors():
+    # A tall image, so there is room to spare vertically
+    size = (1000, 3000)
+    aspect_ratio = 16 / 9
+    (_, top, _, top_bottom), = plan_crops([size], aspect_ratio, 'top').tolist()
+    (_, center, _, _), = plan_crops([size], aspect_ratio, 'center').tolist()
+    (_, thirds, _, thirds_bottom), = plan_crops([size], aspect_ratio, 'thirds').tolist()
+    assert top == 0 and top_bottom == 562
+    assert center == (3000 - 562) // 2
+    assert (thirds + thirds_bottom) // 2 == 1000
+
+    # Clamped to the image where the crop is taller than two thirds of it
+    (_, y1, _, y2), = plan_crops([(1600, 1000)], aspect_ratio, 'thirds').tolist()
+    assert y1 == 0 and y2 == 900
+
+def test_unknown_anchor():
+    with pytest.raises(ValueError):
+        plan_crops([(100, 100)], 1.0, 'bottom')
+
+@pytest.mark.parametrize('fill', [0.25, 0.5, 0.8, 1.0])
+def test_fill_fraction(fill):
+    # Wider than 2:1, so the height constrains the crop
+    (x1, y1, x2, y2), = plan_crops([(5000, 1000)], 2.0, 'center', fill).tolist()
+    assert y2 - y1 == int(1000 * fill)
+    assert x2 - x1 == int((y2 - y1) * 2.0)
+    # Taller than 2:1, so the width does
+    (x1, y1, x2, y2), = plan_crops([(1000, 5000)], 2.0, 'top', fill).tolist()
+    assert x2 - x1 == int(1000 * fill)
+    assert y1 == 0
+
+    assert plan_crops([(1234, 567)], 2.0).tolist() == plan_crops([(1234, 567)], 2.0, 'default', DEFAULT_FILL).tolist()
+
+@pytest.mark.parametrize('layout', LAYOUTS.values(), ids=LAYOUTS.keys())
+def test_monitor_boxes_share_edges(layout):
+    sizes = random_sizes(500, seed=5)
+    for boxes in plan_monitor_boxes(sizes, layout).tolist():
+        assert_edges_shared(layout, boxes)
+
+def test_mixed_resolution_split():
+    layout = LAYOUTS['mixed']
+    boxes = layout.map_box((0, 0, 5760, 1440))
+    assert boxes == [(0, 0, 1920, 1080), (1920, 0, 4480, 1440), (4480, 0, 5760, 1024)]
+
+def test_vertical_split():
+    layout = LAYOUTS['stacked']
+    assert layout.aspect_ratio == 2560 / 2520
+    top, bottom = layout.map_box((100, 50, 100 + 1280, 50 + 1260))
+    assert top == (100, 50, 100 + 960, 50 + 540)
+    assert bottom == (100, 50 + 540, 100 + 1280, 50 + 1260)
+    assert layout.suffixes() == ['_top', '_bottom']
+
+def test_bezels_leave_out_the_gap():
+    layout = MonitorLayout.side_by_side([(1920, 1080)] * 3).with_bezels(60)
+    assert layout.monitors == [(0, 0, 1920, 1080), (1980, 0, 1920, 1080), (3960, 0, 1920, 1080)]
+    assert layout.aspect_ratio == 5880 / 1080
+    boxes = layout.map_box((0, 0, 5880, 1080))
+    assert [right for _, _, right, _ in boxes] == [1920, 3900, 5880]
+    assert [left for left, _, _, _ in boxes] == [0, 1980, 3960]
+
+    # Scaled with the crop, the gap stays the bezel's share of it
+    boxes = layout.map_box((0, 0, 2940, 540))
+    assert [left - right for (_, _, right, _), (left, _, _, _) in zip(boxes, boxes[1:])] == [30, 30]
+
+def test_bezels_on_rows():
+    layout = LAYOUTS['stacked'].with_bezels(40, 20)
+    assert layout.monitors == [(0, 0, 1920, 1080), (0, 1100, 2560, 1440)]
+    assert MonitorLayout(LAYOUTS['stacked'].monitors).with_bezels(0).monitors == LAYOUTS['stacked'].monitors
+
+@pytest.mark.parametrize('layout', LAYOUTS.values(), ids=LAYOUTS.keys())
+def test_float_boxes_map_to_whole_pixels(layout):
+    rng = np.random.default_rng(13)
+    for _ in range(200):
+        x1, y1 = rng.uniform(0, 500, 2)
+        width = rng.uniform(200, 6000)
+        box = (x1, y1, x1 + width, y1 + width / layout.aspect_ratio)
+
+        # What a lossless save does with the GUI's float monitor boxes
+        rounded = [tuple(round(v) for v in monitor_box) for monitor_box in layout.map_box_f(box)]
+        assert_edges_shared(layout, rounded)
+
+        boxes = layout.map_box(box)
+        assert all(isinstance(v, int) for monitor_box in boxes for v in monitor_box)
+        assert_edges_shared(layout, boxes)
+        assert boxes == layout.map_box(tuple(round(v) for v in box))
+
+def test_map_boxes_shapes():
+    layout = LAYOUTS['mixed']
+    boxes = np.array([[0, 0, 5760, 1440], [10, 20, 2890, 740]])
+    assert map_boxes(boxes, layout.fractions).shape == (2, 3, 4)
+    assert map_boxes(boxes[0], layout.fractions).shape == (1, 3, 4)
+
+@pytest.mark.parametrize('layout', [
+    MonitorLayout.side_by_side([(192, 108), (256, 144), (128, 102)]),
+    MonitorLayout([(0, 0, 192, 108), (0, 108, 256, 144)]),
+    MonitorLayout.side_by_side([(192, 108)] * 2).with_bezels(7),
+], ids=['mixed', 'stacked', 'bezels'])
+def test_exported_slices_have_their_monitor_size(tmp_path, layout):
+    image = Image.linear_gradient('L').resize((1013, 777)).convert('RGB')
+    for anchor in ANCHORS:
+        box = initial_crop_box(image.size, layout.aspect_ratio, anchor)
+        monitor_boxes = layout.map_box_f(fit_crop_box(box, layout.aspect_ratio, image.size))
+        paths = [str(tmp_path / f'{anchor}{suffix}.png') for suffix in layout.suffixes()]
+        export_slices(image, list(zip(monitor_boxes, paths)), sizes=layout.sizes())
+        for path, size in zip(paths, layout.sizes()):
+            with Image.open(path) as output:
+                assert output.size == size
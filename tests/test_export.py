@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from export import FLATTEN_BACKGROUND, SAVE_MODES, convert_for_format, save_atomic
+
+@pytest.mark.parametrize('output_format, mode, expected', [
+    ('JPEG', 'RGB', 'RGB'),
+    ('JPEG', 'L', 'L'),
+    ('JPEG', 'CMYK', 'CMYK'),
+    ('JPEG', 'RGBA', 'RGB'),
+    ('JPEG', 'LA', 'L'),
+    ('JPEG', 'PA', 'RGB'),
+    ('JPEG', 'P', 'RGB'),
+    ('JPEG', 'I;16', 'L'),
+    ('JPEG', 'I', 'L'),
+    ('PNG', 'RGBA', 'RGBA'),
+    ('PNG', 'P', 'P'),
+    ('PNG', 'PA', 'RGBA'),
+    ('PNG', 'CMYK', 'RGB'),
+    ('PNG', 'I', 'I;16'),
+    ('BMP', 'LA', 'RGBA'),
+    ('BMP', 'CMYK', 'RGB'),
+    ('TIFF', 'CMYK', 'CMYK'),
+])
+def test_convert_for_format(tmp_path, output_format, mode, expected):
+    image = Image.new(mode, (4, 4))
+    converted = convert_for_format(image, output_format)
+    assert converted.mode == expected
+    assert converted.mode in SAVE_MODES.get(output_format, (converted.mode,))
+    extension = {'JPEG': '.jpg', 'PNG': '.png', 'BMP': '.bmp', 'TIFF': '.tif'}[output_format]
+    save_atomic(image, str(tmp_path / f'out{extension}'))
+
+def test_flattens_onto_the_background():
+    image = Image.new('RGBA', (2, 1), (200, 100, 50, 255))
+    image.putpixel((1, 0), (200, 100, 50, 0))
+    flattened = convert_for_format(image, 'JPEG')
+    assert flattened.getpixel((0, 0)) == (200, 100, 50)
+    assert flattened.getpixel((1, 0)) == FLATTEN_BACKGROUND
+
+def test_palette_transparency_is_flattened():
+    image = Image.new('P', (2, 1), 1)
+    image.putpalette([0, 0, 0, 255, 255, 255])
+    image.putpixel((1, 0), 0)
+    image.info['transparency'] = 1
+    flattened = convert_for_format(image, 'JPEG')
+    assert flattened.mode == 'RGB'
+    assert flattened.getpixel((0, 0)) == FLATTEN_BACKGROUND
+
+def test_16_bit_is_scaled_to_8_bit():
+    image = Image.fromarray(np.array([[0, 256, 32768, 65535]], dtype=np.uint16))
+    assert image.mode == 'I;16'
+    assert convert_for_format(image, 'JPEG').tobytes() == bytes([0, 1, 128, 255])
@@ -0,0 +1,34 @@
+import pytest
+from PIL import Image
+
+import image_pyramid
+from image_pyramid import ImagePyramid, reducible
+
+def palette_source(size=(640, 360)):
+    return Image.linear_gradient('L').resize(size).convert('RGB').convert('P', palette=Image.Palette.ADAPTIVE)
+
+@pytest.mark.parametrize('mode', ['P', '1', 'RGB'])
+def test_level_0_is_converted_once(monkeypatch, mode):
+    source = palette_source() if mode == 'P' else Image.linear_gradient('L').resize((640, 360)).convert(mode)
+    conversions = []
+    original = image_pyramid.reducible
+    monkeypatch.setattr(image_pyramid, 'reducible', lambda image: conversions.append(image.mode) or original(image))
+
+    pyramid = ImagePyramid(source, (100, 100))
+    expected = reducible(source).resize((300, 150), Image.Resampling.BILINEAR, box=(0, 0, 400, 200))
+    for _ in range(3):
+        region = pyramid.region((0, 0, 400, 200), (300, 150))
+        assert region.tobytes() == expected.tobytes()
+        # Reduced levels are built from the converted copy as well
+        assert pyramid.level(1).mode == reducible(source).mode
+    assert conversions == [mode]
+    assert pyramid.level(0) is source
+
+def test_regions_come_from_the_smallest_level_that_covers_them():
+    source = palette_source((1024, 512))
+    pyramid = ImagePyramid(source, (64, 64), source_size=(4096, 2048))
+    assert pyramid.level_sizes == [(1024, 512), (512, 256), (256, 128), (128, 64), (64, 32)]
+    region = pyramid.region((0, 0, 4096, 2048), (128, 64))
+    assert region.size == (128, 64)
+    assert region.mode == 'RGB'
+    assert pyramid.cached_bytes > 0
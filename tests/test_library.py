@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+from PIL import Image
+
+from library_index import LibraryIndex, build_entries, scan_folder
+
+def wallpapers(folder, names, size=(320, 90)):
+    for name in names:
+        Image.linear_gradient('L').resize(size).convert('RGB').save(folder / name)
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path / 'index' / 'library.sqlite'))
+    yield index
+    index.close()
+
+def test_unreadable_files_are_skipped_until_they_change(tmp_path, index):
+    folder = tmp_path / 'walls'
+    folder.mkdir()
+    wallpapers(folder, ['a.png'])
+    (folder / 'broken.jpg').write_bytes(b'not an image')
+
+    stale, _ = index.refresh_plan(str(folder), scan_folder(str(folder)))
+    assert len(stale) == 2
+    entries = build_entries(stale)
+    assert [entry['failed'] for entry in entries] == [False, True]
+    index.store(entries)
+
+    assert [row['path'] for row in index.entries(str(folder))] == [str(folder / 'a.png')]
+    assert index.matching_aspect(str(folder), 0.0, tolerance=1.0) == []
+    assert index.refresh_plan(str(folder), scan_folder(str(folder))) == ([], [])
+
+    # Fixed on disk: tried again
+    wallpapers(folder, ['broken.jpg'])
+    stale, _ = index.refresh_plan(str(folder), scan_folder(str(folder)))
+    assert [path for path, _ in stale] == [str(folder / 'broken.jpg')]
+    index.store(build_entries(stale))
+    assert len(index.entries(str(folder))) == 2
+
+def test_old_index_gains_the_failed_column(tmp_path):
+    path = str(tmp_path / 'library.sqlite')
+    db = sqlite3.connect(path)
+    db.execute(
+        'CREATE TABLE images (path TEXT PRIMARY KEY, folder TEXT NOT NULL, mtime_ns INTEGER NOT NULL, '
+        'size INTEGER NOT NULL, width INTEGER NOT NULL, height INTEGER NOT NULL, aspect REAL NOT NULL, '
+        'hash TEXT NOT NULL, thumbnail BLOB NOT NULL)'
+    )
+    db.execute("INSERT INTO images VALUES ('/w/a.png', '/w', 1, 2, 320, 90, 3.5, 'h', x'00')")
+    db.commit()
+    db.close()
+
+    index = LibraryIndex(path)
+    try:
+        assert [row['path'] for row in index.entries('/w')] == ['/w/a.png']
+    finally:
+        index.close()
+
+def test_grid_inserts_indexed_chunks_without_a_reset(qapp, tmp_path):
+    from library_view import BUILD_CHUNK, LibraryWindow
+
+    folder = tmp_path / 'walls'
+    folder.mkdir()
+    names = [f'{number:03}.png' for number in range(0, 2 * BUILD_CHUNK + 5, 2)]
+    wallpapers(folder, names)
+    window = LibraryWindow(32 / 9, str(tmp_path / 'library.sqlite'))
+    try:
+        window.folder = str(folder)
+        resets = []
+        inserted = []
+        window.model.modelReset.connect(lambda: resets.append(True))
+        window.model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+
+        stale, _ = window.index.refresh_plan(window.folder, scan_folder(window.folder))
+        window.store_entries(('build', window.folder, 0), build_entries(stale[::2]))
+        window.store_entries(('build', window.folder, 1), build_entries(stale[1::2]))
+        assert not resets
+        assert len(inserted) == len(names)
+        assert [row['path'] for row in window.model.rows] == [str(folder / name) for name in names]
+
+        # A changed file replaces its row, one that became unreadable leaves the grid
+        (folder / names[0]).write_bytes(b'broken')
+        rebuilt = build_entries([(str(folder / names[0]), (0, 6)), (str(folder / names[1]), (0, 1))])
+        window.store_entries(('build', window.folder, 2), rebuilt)
+        assert not resets
+        assert [row['path'] for row in window.model.rows] == [str(folder / name) for name in names[1:]]
+
+        # With "Fits my monitors" ticked, images of another shape are not added
+        window.fits_check.setChecked(True)
+        wallpapers(folder, ['square.png'], size=(100, 100))
+        window.store_entries(('build', window.folder, 3), build_entries([(str(folder / 'square.png'), (0, 1))]))
+        assert str(folder / 'square.png') not in [row['path'] for row in window.model.rows]
+        assert window.status_label.text() == f'{len(names) - 1} images'
+    finally:
+        window.shutdown()
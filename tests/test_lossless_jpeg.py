@@ -0,0 +1,132 @@
+import os
+import stat
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from layout import MonitorLayout
+from lossless_jpeg import export_lossless, lossless_jobs, mcu_size, snap_edges
+
+# Stands in for jpegtran: parses the same arguments and crops with Pillow
+STUB_JPEGTRAN = textwrap.dedent('''\
+    #!{python}
+    import sys
+    from PIL import Image
+
+    args = sys.argv[1:]
+    size, _, offset = args[args.index('-crop') + 1].partition('+')
+    width, height = map(int, size.split('x'))
+    x, y = map(int, offset.split('+'))
+    with Image.open(args[-1]) as image:
+        image.crop((x, y, x + width, y + height)).save(args[args.index('-outfile') + 1], 'JPEG')
+''')
+
+def jpeg(path, size=(1000, 400), subsampling=2):
+    rng = np.random.default_rng(3)
+    pixels = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    Image.fromarray(pixels, 'RGB').save(path, subsampling=subsampling)
+    return str(path)
+
+def stub(tmp_path, body):
+    path = tmp_path / 'jpegtran'
+    path.write_text(body)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+def assert_contiguous(boxes, snapped):
+    """Edges shared before snapping are still shared, on both axes"""
+    for axis in (0, 1):
+        moved = {}
+        for box, snapped_box in zip(boxes, snapped):
+            for index in (axis, axis + 2):
+                assert moved.setdefault(box[index], snapped_box[index]) == snapped_box[index]
+    for (_, _, right, _), (left, _, _, _) in zip(snapped, snapped[1:]):
+        assert right == left
+
+@pytest.mark.parametrize('subsampling, mcu', [(0, (8, 8)), (1, (16, 8)), (2, (16, 16))])
+def test_mcu_size(tmp_path, subsampling, mcu):
+    with Image.open(jpeg(tmp_path / 'source.jpg', subsampling=subsampling)) as image:
+        assert mcu_size(image) == mcu
+
+@pytest.mark.parametrize('mcu', [(8, 8), (16, 16)])
+def test_snapped_slices_stay_contiguous(mcu):
+    boxes = [(601, 729, 3002, 2079), (3002, 729, 5404, 2079)]
+    snapped = snap_edges(boxes, mcu)
+    assert_contiguous(boxes, snapped)
+    for (x1, y1, _, _), (ox1, oy1, _, _) in zip(snapped, boxes):
+        assert x1 % mcu[0] == 0 and y1 % mcu[1] == 0
+        assert 0 <= ox1 - x1 < mcu[0] and 0 <= oy1 - y1 < mcu[1]
+    # The crop as a whole only moves, it keeps its size
+    assert snapped[-1][2] - snapped[0][0] == boxes[-1][2] - boxes[0][0]
+    assert snapped[0][3] - snapped[0][1] == boxes[0][3] - boxes[0][1]
+
+def test_snapped_layout_slices_stay_contiguous():
+    layout = MonitorLayout.side_by_side([(1920, 1080), (2560, 1440), (1920, 1080)])
+    for box in [(7, 5, 6407, 1445), (123, 77, 3323, 797), (1, 1, 641, 145)]:
+        boxes = layout.map_box(box)
+        assert_contiguous(boxes, snap_edges(boxes, (16, 16)))
+
+def test_snapped_vertical_stack_stays_contiguous():
+    layout = MonitorLayout([(0, 0, 1920, 1080), (0, 1080, 1920, 1080)])
+    top, bottom = snap_edges(layout.map_box((9, 13, 1929, 2173)), (16, 16))
+    assert top[3] == bottom[1]
+    assert (top[0], top[2]) == (bottom[0], bottom[2])
+
+def test_slices_narrower_than_an_mcu_are_not_eligible():
+    assert snap_edges([(3, 0, 8, 16), (8, 0, 20, 16)], (16, 16)) is None
+
+def test_unaligned_boxes_without_snap(tmp_path):
+    path = jpeg(tmp_path / 'source.jpg')
+    outputs = [str(tmp_path / 'left.jpg'), str(tmp_path / 'right.jpg')]
+    aligned = list(zip([(16, 16, 496, 336), (496, 16, 976, 336)], outputs))
+    unaligned = list(zip([(17, 16, 496, 336), (496, 16, 976, 336)], outputs))
+    assert lossless_jobs(path, aligned, snap=False) == aligned
+    assert lossless_jobs(path, unaligned, snap=False) is None
+    assert lossless_jobs(path, [(box, str(tmp_path / 'out.png')) for box, _ in aligned]) is None
+
+def test_export_with_jpegtran(tmp_path, monkeypatch):
+    monkeypatch.setenv('WALLCROP_JPEGTRAN', stub(tmp_path, STUB_JPEGTRAN.format(python=sys.executable)))
+    path = jpeg(tmp_path / 'source.jpg')
+    outputs = [str(tmp_path / 'left.jpg'), str(tmp_path / 'right.jpg')]
+    jobs = list(zip([(21, 19, 500, 339), (500, 19, 979, 339)], outputs))
+
+    assert export_lossless(path, jobs) == outputs
+    with Image.open(outputs[0]) as left, Image.open(outputs[1]) as right:
+        # Snapped to (16, 16, 496, 336) and (496, 16, 974, 336)
+        assert left.size == (480, 320)
+        assert right.size == (478, 320)
+
+@pytest.mark.parametrize('jpegtran', ['missing', 'failing'])
+def test_falls_back_without_a_working_jpegtran(tmp_path, monkeypatch, capsys, jpegtran):
+    if jpegtran == 'missing':
+        command = str(tmp_path / 'no-such-jpegtran')
+    else:
+        command = stub(tmp_path, '#!/bin/sh\necho "broken" >&2\nexit 1\n')
+    monkeypatch.setenv('WALLCROP_JPEGTRAN', command)
+    path = jpeg(tmp_path / 'source.jpg')
+    jobs = [((16, 16, 496, 336), str(tmp_path / 'left.jpg')), ((496, 16, 976, 336), str(tmp_path / 'right.jpg'))]
+
+    assert export_lossless(path, jobs) is None
+    assert 'Lossless crop failed, re-encoding instead' in capsys.readouterr().out
+    # Nothing published and no temp files left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        name for name in ('jpegtran', 'source.jpg') if os.path.exists(tmp_path / name)
+    )
+
+def test_batch_falls_back_without_jpegtran(tmp_path, monkeypatch):
+    from batch import crop_file
+
+    monkeypatch.setenv('WALLCROP_JPEGTRAN', str(tmp_path / 'no-such-jpegtran'))
+    path = jpeg(tmp_path / 'source.jpg')
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    layout = MonitorLayout.side_by_side([(192, 108), (192, 108)])
+
+    _, _, outputs = crop_file(path, str(output_dir), layout, 'center', None, lossless=True)
+    assert [os.path.basename(output) for output in outputs] == ['source_left.jpg', 'source_right.jpg']
+    for output in outputs:
+        with Image.open(output) as image:
+            assert image.size == (192, 108)
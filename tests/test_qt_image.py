@@ -0,0 +1,91 @@
+import json
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+from PIL import Image
+from PyQt6.QtGui import QImage
+
+from conftest import SRC
+from qt_image import QT_LAYOUTS, pil_to_qimage, qt_compatible_mode
+
+def noise_image(mode, size=(67, 41)):
+    """Random pixels in mode; odd sizes so Qt pads its scanlines"""
+    rng = np.random.default_rng(0)
+    width, height = size
+    if mode == 'I;16':
+        return Image.fromarray(rng.integers(0, 65536, (height, width), dtype=np.uint16))
+    image = Image.fromarray(rng.integers(0, 256, (height, width, 4), dtype=np.uint8), 'RGBA')
+    if mode == 'P':
+        return image.convert('RGB').convert('P', palette=Image.Palette.ADAPTIVE)
+    return image.convert(mode)
+
+def qimage_rows(qimage, bytes_per_pixel):
+    """Pixel bytes of a QImage without its scanline padding"""
+    bits = qimage.constBits()
+    bits.setsize(qimage.sizeInBytes())
+    data = bytes(bits)
+    stride = qimage.bytesPerLine()
+    row_bytes = qimage.width() * bytes_per_pixel
+    return b''.join(data[row * stride:row * stride + row_bytes] for row in range(qimage.height()))
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBX', 'RGBA', 'L', 'I;16', 'P', 'LA', '1', 'CMYK', 'I', 'F'])
+def test_pil_to_qimage_matches_pillow(qapp, mode):
+    image = noise_image(mode)
+    qimage = pil_to_qimage(image)
+
+    target = qt_compatible_mode(image)
+    raw_mode, image_format, bytes_per_pixel = QT_LAYOUTS[target]
+    assert qimage.format() == image_format
+    assert (qimage.width(), qimage.height()) == image.size
+    expected = (image if image.mode == target else image.convert(target)).tobytes('raw', raw_mode)
+    assert qimage_rows(qimage, bytes_per_pixel) == expected
+
+def test_transparent_palette_keeps_alpha(qapp):
+    image = noise_image('P')
+    image.info['transparency'] = 0
+    qimage = pil_to_qimage(image)
+    assert qimage.format() == QImage.Format.Format_RGBA8888
+
+# Child process, so its peak RSS covers only the source image and the conversion
+CONVERT_SCRIPT = textwrap.dedent('''
+    import json, sys, time
+    sys.path.insert(0, {src!r})
+    from PIL import Image
+    from PyQt6.QtGui import QGuiApplication
+    app = QGuiApplication(['test', '-platform', 'offscreen'])
+    from qt_image import pil_to_qimage
+
+    image = Image.new({mode!r}, {size!r}, 128)
+    def peak_rss():
+        # VmHWM starts over at exec, unlike ru_maxrss, which keeps the parent's peak
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+
+    before = peak_rss()
+    start = time.perf_counter()
+    qimage = pil_to_qimage(image)
+    seconds = time.perf_counter() - start
+    after = peak_rss()
+    print(json.dumps({{'growth': (after - before) * 1024, 'seconds': seconds,
+                       'qimage_bytes': qimage.sizeInBytes()}}))
+''')
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='reads the peak RSS from /proc')
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P'])
+def test_large_conversion_peak_memory(mode):
+    """A 48 MP conversion allocates the QImage once, plus band-sized scratch"""
+    size = (8000, 6000)
+    output = subprocess.run(
+        [sys.executable, '-c', CONVERT_SCRIPT.format(src=SRC, mode=mode, size=size)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"{mode}: {result['seconds'] * 1000:.0f} ms, peak +{result['growth'] / 2**20:.0f} MB "
+          f"for a {result['qimage_bytes'] / 2**20:.0f} MB QImage")
+
+    # Copying through tobytes() and a pixmap would need three full buffers
+    assert result['growth'] <= result['qimage_bytes'] * 1.1 + 32 * 2**20
+    assert result['seconds'] < 10
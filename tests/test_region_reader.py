@@ -0,0 +1,132 @@
+import json
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import SRC
+from export import export_region, export_slices
+from region_reader import ACCESS_FULL, ACCESS_RAW, ACCESS_ROWS, read_region, region_access
+
+SIZE = (517, 301)
+
+BOXES = [
+    (0, 0, 517, 301),
+    (0, 0, 1, 1),
+    (516, 300, 517, 301),
+    (13, 250, 400, 301),
+    (200, 17, 201, 180),
+    (101, 99, 330, 200),
+]
+
+def source(path, mode):
+    rng = np.random.default_rng(1)
+    image = Image.fromarray(rng.integers(0, 256, (SIZE[1], SIZE[0], 3), dtype=np.uint8), 'RGB')
+    if mode == 'P':
+        image = image.convert('P', palette=Image.Palette.ADAPTIVE)
+    elif mode != 'RGB':
+        image = image.convert(mode)
+    image.save(path)
+    return path
+
+@pytest.mark.parametrize('name, mode, access', [
+    ('rgb.ppm', 'RGB', ACCESS_RAW),
+    ('gray.pgm', 'L', ACCESS_RAW),
+    ('rgb.bmp', 'RGB', ACCESS_RAW),
+    ('palette.bmp', 'P', ACCESS_RAW),
+    ('rgb.tif', 'RGB', ACCESS_RAW),
+    ('rgba.tif', 'RGBA', ACCESS_RAW),
+    ('cmyk.tif', 'CMYK', ACCESS_RAW),
+    ('rgb.png', 'RGB', ACCESS_ROWS),
+    ('rgb.jpg', 'RGB', ACCESS_FULL),
+])
+def test_read_region_matches_full_decode(tmp_path, name, mode, access):
+    path = source(str(tmp_path / name), mode)
+    with Image.open(path) as probe:
+        assert region_access(probe) == access
+    with Image.open(path) as full:
+        full.load()
+        for box in BOXES:
+            region = read_region(path, box)
+            expected = full.crop(box)
+            assert region.size == expected.size
+            assert region.mode == expected.mode
+            assert region.tobytes() == expected.tobytes()
+            if mode == 'P':
+                assert region.getpalette() == expected.getpalette()
+
+def test_export_region_matches_full_export(tmp_path):
+    path = source(str(tmp_path / 'source.bmp'), 'RGB')
+    jobs = [((40, 30, 240, 142), 'left.png'), ((240, 30, 440, 142), 'right.png')]
+    with Image.open(path) as full:
+        full.load()
+        from_full = export_slices(full, [(box, str(tmp_path / f"full_{name}")) for box, name in jobs])
+    by_region = export_region(path, [(box, str(tmp_path / f"region_{name}")) for box, name in jobs])
+
+    for full_path, region_path in zip(from_full, by_region):
+        with Image.open(full_path) as a, Image.open(region_path) as b:
+            assert a.tobytes() == b.tobytes()
+
+def test_export_region_resampled_matches_full_export(tmp_path):
+    path = source(str(tmp_path / 'source.ppm'), 'RGB')
+    jobs = [((40.4, 30.2, 240.7, 142.9), 'left.png'), ((240.7, 30.2, 441.0, 142.9), 'right.png')]
+    sizes = [(160, 90), (160, 90)]
+    with Image.open(path) as full:
+        full.load()
+        from_full = export_slices(full, [(box, str(tmp_path / f"full_{n}")) for box, n in jobs], sizes=sizes)
+    by_region = export_region(path, [(box, str(tmp_path / f"region_{n}")) for box, n in jobs], sizes=sizes)
+
+    for full_path, region_path in zip(from_full, by_region):
+        with Image.open(full_path) as a, Image.open(region_path) as b:
+            assert a.size == b.size == (160, 90)
+            difference = np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16))
+            # Only the filter support beyond the region's edge pixels differs
+            assert difference.mean() < 1.0
+
+# Child process, so its peak RSS covers only the export
+EXPORT_SCRIPT = textwrap.dedent('''
+    import json, sys
+    sys.path.insert(0, {src!r})
+    from export import export_region
+
+    def peak_rss():
+        # VmHWM starts over at exec, unlike ru_maxrss, which keeps the parent's peak
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+
+    before = peak_rss()
+    paths = export_region({path!r}, {jobs!r}, sizes={sizes!r})
+    after = peak_rss()
+    print(json.dumps({{'growth': (after - before) * 1024, 'paths': paths}}))
+''')
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='reads the peak RSS from /proc')
+def test_export_region_memory_is_bounded_by_the_crop(tmp_path):
+    """Exporting from a 50 MP raw source never decodes the whole image"""
+    width, height = 10000, 5000
+    path = str(tmp_path / 'large.ppm')
+    rng = np.random.default_rng(2)
+    with open(path, 'wb') as f:
+        f.write(f"P6\n{width} {height}\n255\n".encode())
+        for _ in range(0, height, 500):
+            f.write(rng.integers(0, 256, (500, width, 3), dtype=np.uint8).tobytes())
+
+    jobs = [
+        ((3000, 2000, 4920, 3080), str(tmp_path / 'left.png')),
+        ((4920, 2000, 6840, 3080), str(tmp_path / 'right.png')),
+    ]
+    output = subprocess.run(
+        [sys.executable, '-c', EXPORT_SCRIPT.format(src=SRC, path=path, jobs=jobs, sizes=[(1920, 1080)] * 2)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    decoded_bytes = width * height * 4
+    print(f"peak +{result['growth'] / 2**20:.0f} MB, a full decode is {decoded_bytes / 2**20:.0f} MB")
+    assert result['growth'] < decoded_bytes / 3
+    for output_path in result['paths']:
+        with Image.open(output_path) as image:
+            assert image.size == (1920, 1080)
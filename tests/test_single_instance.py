@@ -0,0 +1,98 @@
+import os
+import socket
+import sys
+import time
+import uuid
+
+import pytest
+from PyQt6.QtNetwork import QLocalServer
+
+from single_instance import InstanceServer, send_to_running
+
+@pytest.fixture
+def name():
+    """A socket name no running wallcrop uses"""
+    name = f"wallcrop-test-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    yield name
+    QLocalServer.removeServer(name)
+
+def wait_for(qapp, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+    return condition()
+
+def test_no_running_instance(qapp, name):
+    assert send_to_running(['a.jpg'], name=name, timeout=100) is False
+
+def test_paths_round_trip(qapp, name, tmp_path, monkeypatch):
+    server = InstanceServer(name)
+    received = []
+    server.paths_received.connect(received.append)
+    assert server.listen()
+    try:
+        monkeypatch.chdir(tmp_path)
+        assert send_to_running(['relative.jpg', '/elsewhere/absolute.png'], name=name)
+        assert send_to_running([], name=name)
+        assert wait_for(qapp, lambda: len(received) == 2)
+    finally:
+        server.close()
+
+    # Relative paths are resolved against the sender's working directory
+    assert received[0] == [str(tmp_path / 'relative.jpg'), os.path.abspath('/elsewhere/absolute.png')]
+    # An empty message only asks the window to come forward
+    assert received[1] == []
+
+def test_second_server_does_not_take_over(qapp, name):
+    first = InstanceServer(name)
+    received = []
+    first.paths_received.connect(received.append)
+    assert first.listen()
+    second = InstanceServer(name)
+    try:
+        assert not second.listen()
+        assert send_to_running(['/x.jpg'], name=name)
+        assert wait_for(qapp, lambda: received == [['/x.jpg']])
+    finally:
+        second.close()
+        first.close()
+
+def test_malformed_message_is_ignored(qapp, name):
+    from PyQt6.QtNetwork import QLocalSocket
+
+    server = InstanceServer(name)
+    received = []
+    server.paths_received.connect(received.append)
+    assert server.listen()
+    try:
+        client = QLocalSocket()
+        client.connectToServer(name)
+        assert client.waitForConnected(1000)
+        client.write(b'not json\n')
+        client.waitForBytesWritten(1000)
+        client.disconnectFromServer()
+        assert send_to_running(['/after.jpg'], name=name)
+        assert wait_for(qapp, lambda: received == [['/after.jpg']])
+    finally:
+        server.close()
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX') or sys.platform == 'win32',
+                    reason='stale sockets are files on Unix only')
+def test_stale_socket_is_replaced(qapp, name):
+    # Ask Qt where it puts the socket file for this name
+    probe = QLocalServer()
+    assert probe.listen(name)
+    socket_path = probe.fullServerName()
+    probe.close()
+
+    # A socket file nothing listens on, as left by a crashed instance
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(socket_path)
+    stale.close()
+    assert os.path.exists(socket_path)
+
+    server = InstanceServer(name)
+    try:
+        assert server.listen()
+    finally:
+        server.close()